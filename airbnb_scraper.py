@@ -1,11 +1,9 @@
 import os
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
 from urllib.parse import urljoin
-import requests
+from browser_pool import browser, load_page
+from download_manager import download_all
+from link_discovery import discover_links
+from link_index import LinkIndex
 
 BASE_URL = "https://investors.airbnb.com/financials/default.aspx#quarterly"
 DOWNLOAD_DIR = "pdf_downloads_airbnb"
@@ -14,73 +12,124 @@ def ensure_dir(path):
     if not os.path.exists(path):
         os.makedirs(path)
 
-def download_pdf(url, download_dir, filename):
-    local_filename = os.path.join(download_dir, filename)
-    if os.path.exists(local_filename):
-        print(f"Already downloaded: {local_filename}")
-        return
-    try:
-        r = requests.get(url, stream=True, timeout=20)
-        r.raise_for_status()
-        with open(local_filename, 'wb') as f:
-            for chunk in r.iter_content(8192):
-                f.write(chunk)
-        print(f"Downloaded: {local_filename}")
-    except Exception as e:
-        print(f"Failed to download {url}: {e}")
+def remember(index, url, year, link_text, aria_label, doc_type):
+    """Resolves the file name of a newly seen link, stores it in the index and returns it."""
+    quarter = link_text.strip().replace(' ', '')
+    if not quarter:
+        # Try to get from aria-label
+        quarter = aria_label
+        if quarter:
+            quarter = quarter.split()[0]
+    if not quarter:
+        quarter = 'Q?'
+    filename = f"{year}_{quarter}_{doc_type}.pdf"
+    index.add(url, filename, year=year, quarter=quarter, doc_type=doc_type)
+    return filename
 
-def scrape_airbnb_pdfs():
-    ensure_dir(DOWNLOAD_DIR)
-
-    chrome_options = Options()
-    #chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-    driver.get(BASE_URL)
-    time.sleep(5)  # Wait for the page to load
-
-    # Find the financials table
-    table = driver.find_element("xpath", "//div[contains(@class, 'module-financial-table_header')]/following-sibling::table")
-    # Get year headers from the table
-    year_headers = table.find_elements("xpath", ".//tr[1]/td | .//tr[1]/th | .//thead/tr/th | .//thead/tr/td")
-    years = []
-    for header in year_headers:
-        text = header.text.strip()
-        if text.isdigit():
-            years.append(text)
+def parse_static_links(soup, base_url, index):
+    """Reads the financials table from the initial HTML; None if it is rendered client-side."""
+    header = soup.find("div", class_="module-financial-table_header")
+    table = header.find_next_sibling("table") if header else None
+    if table is None:
+        return None
+    first_row = table.find("tr")
+    years = [cell.get_text(strip=True) for cell in (first_row.find_all(["td", "th"]) if first_row else [])]
+    years = [y for y in years if y.isdigit()]
     if not years:
-        # Fallback: try to get years from visible year header divs
-        years = [y.text.strip() for y in driver.find_elements("xpath", "//div[contains(@class, 'module-financial-table_header-year')]") if y.text.strip().isdigit()]
+        years = [y.get_text(strip=True) for y in soup.find_all("div", class_="module-financial-table_header-year") if y.get_text(strip=True).isdigit()]
     if not years:
-        print("Could not find year headers.")
-        driver.quit()
-        return
+        return None
 
-    # Iterate over table rows (each row is a document type)
-    rows = table.find_elements("xpath", ".//tr[contains(@class, 'module-financial-table_track')]")
-    for row in rows:
-        try:
-            doc_type = row.find_element("xpath", ".//th").text.strip().replace(' ', '_')
-        except Exception:
+    pdf_links = []
+    for row in table.find_all("tr", class_="module-financial-table_track"):
+        th = row.find("th")
+        if th is None:
             continue
-        cells = row.find_elements("xpath", ".//td")
-        for i, cell in enumerate(cells):
+        doc_type = th.get_text(strip=True).replace(' ', '_')
+        for i, cell in enumerate(row.find_all("td")):
             year = years[i] if i < len(years) else 'unknown'
-            links = cell.find_elements("xpath", ".//a[contains(@href, '.pdf')]")
-            for link in links:
-                href = link.get_attribute("href")
-                quarter = link.text.strip().replace(' ', '')
-                if not quarter:
-                    # Try to get from aria-label
-                    quarter = link.get_attribute('aria-label')
-                    if quarter:
-                        quarter = quarter.split()[0]
-                if not quarter:
-                    quarter = 'Q?'
-                filename = f"{year}_{quarter}_{doc_type}.pdf"
-                download_pdf(href, DOWNLOAD_DIR, filename)
-    driver.quit()
+            for link in cell.find_all("a", href=True):
+                if '.pdf' not in link["href"]:
+                    continue
+                href = urljoin(base_url, link["href"])
+                if href in index:
+                    pdf_links.append((href, index.get(href)["filename"]))
+                else:
+                    pdf_links.append((href, remember(index, href, year, link.get_text(), link.get("aria-label"), doc_type)))
+    return pdf_links or None
+
+def discover_with_browser(index):
+    with browser() as driver:
+        # Wait until the document rows of the financials table are rendered
+        if not load_page(driver, BASE_URL, "tr.module-financial-table_track"):
+            return []
+
+        # Find the financials table
+        table = driver.find_element("xpath", "//div[contains(@class, 'module-financial-table_header')]/following-sibling::table")
+
+        # Cheap pass first: if every PDF link is already indexed, skip the per-cell walk entirely
+        hrefs = [a.get_attribute("href") for a in table.find_elements(
+            "xpath", ".//tr[contains(@class, 'module-financial-table_track')]//td//a[contains(@href, '.pdf')]")]
+        if hrefs and all(href in index for href in hrefs):
+            print(f"All {len(hrefs)} links already indexed.")
+            return [(href, index.get(href)["filename"]) for href in hrefs]
+
+        # Get year headers from the table
+        year_headers = table.find_elements("xpath", ".//tr[1]/td | .//tr[1]/th | .//thead/tr/th | .//thead/tr/td")
+        years = []
+        for header in year_headers:
+            text = header.text.strip()
+            if text.isdigit():
+                years.append(text)
+        if not years:
+            # Fallback: try to get years from visible year header divs
+            years = [y.text.strip() for y in driver.find_elements("xpath", "//div[contains(@class, 'module-financial-table_header-year')]") if y.text.strip().isdigit()]
+        if not years:
+            print("Could not find year headers.")
+            return []
+
+        # Iterate over table rows (each row is a document type)
+        rows = table.find_elements("xpath", ".//tr[contains(@class, 'module-financial-table_track')]")
+        pdf_links = []
+        for row in rows:
+            try:
+                doc_type = row.find_element("xpath", ".//th").text.strip().replace(' ', '_')
+            except Exception:
+                continue
+            cells = row.find_elements("xpath", ".//td")
+            for i, cell in enumerate(cells):
+                year = years[i] if i < len(years) else 'unknown'
+                links = cell.find_elements("xpath", ".//a[contains(@href, '.pdf')]")
+                for link in links:
+                    href = link.get_attribute("href")
+                    if href in index:
+                        pdf_links.append((href, index.get(href)["filename"]))
+                        continue
+                    filename = remember(index, href, year, link.text, link.get_attribute('aria-label'), doc_type)
+                    pdf_links.append((href, filename))
+        return pdf_links
+
+def scrape_airbnb_pdfs(refresh=False):
+    """
+    Links already in the link index are not re-resolved or re-downloaded unless
+    their file is missing; refresh=True revalidates all of them. Returns the
+    download_all() results plus "found", the number of links discovered.
+    """
+    ensure_dir(DOWNLOAD_DIR)
+    index = LinkIndex(DOWNLOAD_DIR)
+
+    pdf_links = discover_links(BASE_URL,
+                               lambda soup, url: parse_static_links(soup, url, index),
+                               lambda: discover_with_browser(index))
+    if not pdf_links:
+        return {}
+
+    to_fetch = pdf_links if refresh else index.pending(pdf_links)
+    print(f"Found {len(pdf_links)} PDF links, {len(to_fetch)} new or missing.")
+    results = download_all(to_fetch, DOWNLOAD_DIR)
+    results["found"] = len(pdf_links)
+    index.save()
+    return results
 
 if __name__ == "__main__":
     scrape_airbnb_pdfs()
@@ -1,11 +1,9 @@
 import os
-import time
-import requests
 from urllib.parse import urljoin
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from browser_pool import browser, load_page, scroll_until_stable
+from download_manager import download_all
+from link_discovery import discover_links
+from link_index import LinkIndex
 
 # List of investor pages
 PAGES = [
@@ -13,6 +11,8 @@ PAGES = [
 ]
 
 DOWNLOAD_DIR = "pdf_downloads_alphabet"
+PDF_ANCHOR_CLASS = "EarningsCard-financialReportPDFLink-link"
+YEAR_TITLE_CLASS = "EarningsCards-title"
 
 def ensure_dir(path):
     if not os.path.exists(path):
@@ -21,103 +21,135 @@ def ensure_dir(path):
 def sanitize_filename(name):
     return name.replace("/", "_").replace(" ", "_").replace("__", "_")
 
-def download_pdf(url, download_dir, suggested_name=None):
+def pdf_filename(url, suggested_name=None):
     filename = suggested_name or url.split("/")[-1].split("?")[0]
     filename = sanitize_filename(filename)
     if not filename.lower().endswith(".pdf"):
         filename += ".pdf"
-    local_path = os.path.join(download_dir, filename)
-
-    if os.path.exists(local_path):
-        print(f"Already downloaded: {local_path}")
-        return
+    return filename
+
+def resolve_metadata(href, aria_label, year):
+    """Returns (year, quarter, report type, <year>_<quarter>_<report type>.pdf) for an anchor."""
+    # Try to get report type from aria-label or href
+    report_type = ""
+    if "10-q" in href.lower():
+        report_type = "10-Q"
+    elif "10-k" in href.lower():
+        report_type = "10-K"
+    elif aria_label:
+        report_type = aria_label.replace("PDF link for ", "").replace(" ", "_")
+    else:
+        report_type = "PDF"
+    # Try to get quarter from href or aria-label
+    quarter = ""
+    for q in ["Q1", "Q2", "Q3", "Q4"]:
+        if q.lower() in href.lower():
+            quarter = q
+            break
+    # Build filename
+    filename_parts = [year, quarter, report_type]
+    filename = "_".join([p for p in filename_parts if p]) + ".pdf"
+    return year, quarter, report_type, sanitize_filename(filename)
+
+def remember(index, url, href, aria_label, year):
+    """Resolves the metadata of a newly seen link, stores it in the index and returns the filename."""
+    year, quarter, report_type, filename = resolve_metadata(href, aria_label, year)
+    index.add(url, filename, year=year, quarter=quarter, doc_type=report_type)
+    return filename
+
+def parse_static_links(soup, base_url, index):
+    """Static counterpart of the browser path; None if the earnings cards are not in the HTML."""
+    pdf_anchors = soup.select(f"a.{PDF_ANCHOR_CLASS}")
+    if not pdf_anchors:
+        return None
+    pdf_links = []
+    for anchor in pdf_anchors:
+        href = anchor.get("href") or ""
+        if not href.lower().endswith(".pdf"):
+            continue
+        full_url = urljoin(base_url, href)
+        if full_url in index:
+            pdf_links.append((full_url, index.get(full_url)["filename"]))
+            continue
+        aria_label = anchor.get("aria-label") or "PDF"
+        # The closest preceding year title, as the six-level parent walk finds in the browser
+        title = anchor.find_previous("h3", class_=YEAR_TITLE_CLASS)
+        year = title.get_text(strip=True) if title else None
+        pdf_links.append((full_url, remember(index, full_url, href, aria_label, year)))
+    return pdf_links or None
+
+def discover_with_browser(base_url, index):
+    pdf_links = []
     try:
-        r = requests.get(url, stream=True, timeout=30)
-        r.raise_for_status()
-        with open(local_path, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-        print(f"Downloaded: {local_path}")
-    except Exception as e:
-        print(f"Failed to download {url}: {e}")
-
-def scrape_all_pdfs():
-    ensure_dir(DOWNLOAD_DIR)
-
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-
-    for base_url in PAGES:
-        print(f"\nScraping {base_url}")
-        try:
-            driver.get(base_url)
-            time.sleep(10)  # Wait longer for dynamic content to load
-
-            # Scroll to bottom to trigger lazy loading
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(3)
+        with browser() as driver:
+            # Wait for the dynamic earnings cards instead of a fixed delay
+            if not load_page(driver, base_url, f"a.{PDF_ANCHOR_CLASS}"):
+                return []
 
-            pdf_links = []
+            # Scroll to bottom to trigger lazy loading until no more cards appear
+            scroll_until_stable(driver, f"a.{PDF_ANCHOR_CLASS}")
 
             # Find all <a> tags with the specific class for PDF links
             pdf_anchors = driver.find_elements(
-                "css selector", "a.EarningsCard-financialReportPDFLink-link"
+                "css selector", f"a.{PDF_ANCHOR_CLASS}"
             )
-            print(f"Found {len(pdf_anchors)} PDF anchor tags with class EarningsCard-financialReportPDFLink-link.")
+            print(f"Found {len(pdf_anchors)} PDF anchor tags with class {PDF_ANCHOR_CLASS}.")
 
             for anchor in pdf_anchors:
-                href = anchor.get_attribute("href")
-                text = anchor.text.strip().lower()
+                href = anchor.get_attribute("href") or ""
+                if not href.lower().endswith(".pdf"):
+                    continue
+                full_url = urljoin(base_url, href)
+                if full_url in index:
+                    # Known link: skip the expensive parent walk and reuse the stored name
+                    pdf_links.append((full_url, index.get(full_url)["filename"]))
+                    continue
                 aria_label = anchor.get_attribute("aria-label") or "PDF"
                 # Traverse up to find the year (from the closest previous h3.EarningsCards-title)
                 year = None
                 parent = anchor
                 for _ in range(6):  # Traverse up to 6 levels up
                     parent = parent.find_element("xpath", "..")
-                    siblings = parent.find_elements("xpath", "preceding-sibling::h3[contains(@class, 'EarningsCards-title')]")
+                    siblings = parent.find_elements("xpath", f"preceding-sibling::h3[contains(@class, '{YEAR_TITLE_CLASS}')]")
                     if siblings:
                         year = siblings[-1].text.strip()
                         break
-                # Try to get report type from aria-label or href
-                report_type = ""
-                if "10-q" in href.lower():
-                    report_type = "10-Q"
-                elif "10-k" in href.lower():
-                    report_type = "10-K"
-                elif aria_label:
-                    report_type = aria_label.replace("PDF link for ", "").replace(" ", "_")
-                else:
-                    report_type = "PDF"
-                # Try to get quarter from href or aria-label
-                quarter = ""
-                for q in ["Q1", "Q2", "Q3", "Q4"]:
-                    if q.lower() in href.lower():
-                        quarter = q
-                        break
-                # Build filename
-                filename_parts = [year, quarter, report_type]
-                filename = "_".join([p for p in filename_parts if p]) + ".pdf"
-                filename = sanitize_filename(filename)
-                if href and href.lower().endswith(".pdf"):
-                    full_url = urljoin(base_url, href)
-                    print(f"PDF Link: {full_url} | Filename: {filename}")
-                    pdf_links.append((full_url, filename))
-
-            if not pdf_links:
-                print(f"No PDF links found on {base_url}")
-            else:
-                print(f"Found {len(pdf_links)} PDF links on {base_url}")
-                for href, filename in pdf_links:
-                    download_pdf(href, DOWNLOAD_DIR, suggested_name=filename)
-
-        except Exception as e:
-            print(f"Error scraping {base_url}: {e}")
-
-    driver.quit()
+                filename = remember(index, full_url, href, aria_label, year)
+                print(f"New PDF Link: {full_url} | Filename: {filename}")
+                pdf_links.append((full_url, filename))
+    except Exception as e:
+        print(f"Error scraping {base_url}: {e}")
+    return pdf_links
+
+def scrape_all_pdfs(refresh=False):
+    """
+    Scrapes every page in PAGES. Links already in the link index are not re-resolved
+    or re-downloaded unless their file is missing; refresh=True revalidates all of them.
+    Returns the download_all() results plus "found", the number of links discovered.
+    """
+    ensure_dir(DOWNLOAD_DIR)
+    index = LinkIndex(DOWNLOAD_DIR)
+
+    results = {"found": 0}
+    for base_url in PAGES:
+        print(f"\nScraping {base_url}")
+        pdf_links = discover_links(base_url,
+                                   lambda soup, url: parse_static_links(soup, url, index),
+                                   lambda: discover_with_browser(base_url, index))
+
+        if not pdf_links:
+            print(f"No PDF links found on {base_url}")
+            continue
+        pdf_links = [(href, pdf_filename(href, filename)) for href, filename in pdf_links]
+        to_fetch = pdf_links if refresh else index.pending(pdf_links)
+        print(f"Found {len(pdf_links)} PDF links on {base_url}, {len(to_fetch)} new or missing.")
+        results["found"] += len(pdf_links)
+        page_results = download_all(to_fetch, DOWNLOAD_DIR)
+        for status, paths in page_results.items():
+            results.setdefault(status, []).extend(paths)
+
+    index.save()
+    return results
 
 if __name__ == "__main__":
     scrape_all_pdfs()
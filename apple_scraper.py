@@ -1,66 +1,51 @@
-
 import os
-import time
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
+from urllib.parse import urljoin
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from browser_pool import browser, load_page
+from download_manager import download_all
+from link_discovery import discover_links
 
+APPLE_URL = "https://investor.apple.com/"
 DOWNLOAD_DIR = "pdf_downloads_apple"
 
 def ensure_dir(path):
     if not os.path.exists(path):
         os.makedirs(path)
 
-def download_pdf(url, download_dir):
-    filename = os.path.join(download_dir, url.split("/")[-1].split("?")[0])
-    if os.path.exists(filename):
-        print(f"Already downloaded: {filename}")
-        return
+def pdf_filename(url):
+    return url.split("/")[-1].split("?")[0]
+
+def parse_static_links(soup, base_url):
+    """Only trust the static HTML once the module_links block the browser waits for is present."""
+    if soup.find(class_="module_links") is None:
+        return None
+    hrefs = [urljoin(base_url, a["href"]) for a in soup.find_all("a", href=True) if ".pdf" in a["href"].lower()]
+    return [(href, pdf_filename(href)) for href in hrefs] or None
+
+def discover_with_browser():
     try:
-        r = requests.get(url, stream=True, timeout=20)
-        r.raise_for_status()
-        with open(filename, 'wb') as f:
-            for chunk in r.iter_content(8192):
-                f.write(chunk)
-        print(f"Downloaded: {filename}")
+        with browser() as driver:
+            if not load_page(driver, APPLE_URL, ".module_links", timeout=15):
+                return []
+
+            all_links = driver.find_elements(By.TAG_NAME, "a")
+            pdf_links = [link.get_attribute("href") for link in all_links if link.get_attribute("href") and ".pdf" in link.get_attribute("href").lower()]
+            return [(link, pdf_filename(link)) for link in pdf_links]
     except Exception as e:
-        print(f"Failed to download {url}: {e}")
+        print(f"Error during scraping: {e}")
+        return []
 
 def scrape_apple():
     ensure_dir(DOWNLOAD_DIR)
 
-    # Remove headless to see the browser (useful for debugging)
-    chrome_options = Options()
-    chrome_options.add_argument("--disable-gpu")
-    # Do NOT add headless to see the browser
-    chrome_options.add_argument("--window-size=1200,1000")
-
-    print("Scraping https://investor.apple.com/")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    print(f"Scraping {APPLE_URL}")
+    pdf_links = discover_links(APPLE_URL, parse_static_links, discover_with_browser)
 
-    try:
-        driver.get("https://investor.apple.com/")
-        wait = WebDriverWait(driver, 15)
-        wait.until(EC.presence_of_element_located((By.CLASS_NAME, "module_links")))
-
-        all_links = driver.find_elements(By.TAG_NAME, "a")
-        pdf_links = [link.get_attribute("href") for link in all_links if link.get_attribute("href") and ".pdf" in link.get_attribute("href").lower()]
-
-        if not pdf_links:
-            print("No PDF links found.")
-        else:
-            print(f"Found {len(pdf_links)} PDF links.")
-            for link in pdf_links:
-                download_pdf(link, DOWNLOAD_DIR)
-    except Exception as e:
-        print(f"Error during scraping: {e}")
-    finally:
-        driver.quit()
+    if not pdf_links:
+        print("No PDF links found.")
+        return {}
+    print(f"Found {len(pdf_links)} PDF links.")
+    return download_all(pdf_links, DOWNLOAD_DIR)
 
 if __name__ == "__main__":
     scrape_apple()
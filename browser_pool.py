@@ -0,0 +1,168 @@
+import os
+import atexit
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from webdriver_manager.chrome import ChromeDriverManager
+
+# --- Configuration ---
+POOL_SIZE = 1            # Chrome instances per worker process
+PAGE_TIMEOUT = 20        # Upper bound for a selector to show up; normally we return much sooner
+POLL_INTERVAL = 0.25
+# Set SCRAPER_DEBUG_BROWSER=1 to get a visible browser that loads every asset, as before.
+DEBUG_BROWSER = os.environ.get("SCRAPER_DEBUG_BROWSER", "").lower() in ("1", "true", "yes")
+
+# Link discovery only needs anchors and table text, so the "discovery" profile
+# refuses everything else. Patterns use the CDP Network.setBlockedURLs syntax.
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.css",
+    "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*", "*segment.io*", "*newrelic.com*", "*nr-data.net*",
+    "*onetrust.com*", "*cookielaw.org*", "*qualtrics.com*",
+]
+CONTENT_SETTING_BLOCK = 2
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def chromedriver_path():
+    """Resolves the ChromeDriver binary once per process instead of once per scrape."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def chrome_options(debug=DEBUG_BROWSER):
+    """The discovery profile: headless with heavy assets disabled, unless debug is set."""
+    chrome_options = Options()
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1200,1000")
+    if debug:
+        return chrome_options
+
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": CONTENT_SETTING_BLOCK,
+        "profile.managed_default_content_settings.media_stream": CONTENT_SETTING_BLOCK,
+        "profile.managed_default_content_settings.plugins": CONTENT_SETTING_BLOCK,
+        "profile.managed_default_content_settings.notifications": CONTENT_SETTING_BLOCK,
+        "profile.managed_default_content_settings.geolocation": CONTENT_SETTING_BLOCK,
+    })
+    # Do not wait for subresources we are going to ignore anyway; the selector waits cover the rest.
+    chrome_options.page_load_strategy = "eager"
+    return chrome_options
+
+
+def block_heavy_requests(driver):
+    """Uses CDP request blocking for the asset types Chrome prefs cannot switch off (fonts, CSS, trackers)."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        print(f"Warning: could not enable request blocking: {e}")
+
+
+class BrowserPool:
+    """A small pool of long-lived Chrome sessions that are handed out one page at a time."""
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _new_driver(self):
+        driver = webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options())
+        if not DEBUG_BROWSER:
+            block_heavy_requests(driver)
+        return driver
+
+    @contextmanager
+    def session(self):
+        with self._slots:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._new_driver()
+                with self._lock:
+                    self._created += 1
+            try:
+                yield driver
+            except Exception:
+                # A session that blew up mid-page may be in any state; do not hand it out again.
+                driver.quit()
+                raise
+            else:
+                self._idle.put(driver)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                break
+
+
+_default_pool = BrowserPool()
+# Only runs in processes that exit normally; pool workers leave through os._exit()
+# and must call close() themselves (see scrape_all._init_worker).
+atexit.register(_default_pool.close)
+
+
+def browser():
+    """Checks out a Chrome session from this process's pool."""
+    return _default_pool.session()
+
+
+def close():
+    """Quits this process's idle Chrome sessions."""
+    _default_pool.close()
+
+
+def load_page(driver, url, css_selector, timeout=PAGE_TIMEOUT):
+    """Opens url and returns as soon as css_selector matches, instead of sleeping a fixed time."""
+    driver.get(url)
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+        )
+        return True
+    except TimeoutException:
+        print(f"Timed out after {timeout}s waiting for '{css_selector}' on {url}")
+        return False
+
+
+def scroll_until_stable(driver, css_selector, timeout=PAGE_TIMEOUT, settle_polls=3):
+    """
+    Scrolls to the bottom to trigger lazy loading and waits until the number of
+    elements matching css_selector has stopped growing for settle_polls polls.
+    """
+    deadline = time.monotonic() + timeout
+    last_count, stable = -1, 0
+    while time.monotonic() < deadline and stable < settle_polls:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        count = len(driver.find_elements(By.CSS_SELECTOR, css_selector))
+        stable = stable + 1 if count == last_count else 0
+        last_count = count
+        time.sleep(POLL_INTERVAL)
+    return last_count
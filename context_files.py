@@ -0,0 +1,89 @@
+import os
+import json
+
+# --- Configuration ---
+PAGE_OFFSETS_SUFFIX = ".pages.json"
+
+
+def page_offsets_path(context_path):
+    return context_path + PAGE_OFFSETS_SUFFIX
+
+
+def write_context_file(pages, context_path):
+    """
+    Streams (page_number, text) pairs into a context file, one page at a time, and
+    records the byte range of every page in <context>.pages.json so later steps can
+    read single pages or slices without loading the whole report.
+    Returns the number of non-empty pages written.
+    """
+    offsets = []
+    tmp_path = context_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        for page_number, page_text in pages:
+            if not page_text:
+                continue
+            data = (page_text + "\n").encode("utf-8")
+            start = f.tell()
+            f.write(data)
+            offsets.append([page_number, start, start + len(data)])
+    os.replace(tmp_path, context_path)
+    with open(page_offsets_path(context_path), 'w', encoding='utf-8') as f:
+        json.dump({"pages": offsets}, f)
+    return len(offsets)
+
+
+def load_page_offsets(context_path):
+    """Returns [[page_number, start_byte, end_byte], ...] or None if the context has no offsets file."""
+    try:
+        with open(page_offsets_path(context_path), 'r', encoding='utf-8') as f:
+            offsets = json.load(f)["pages"]
+    except (OSError, ValueError, KeyError):
+        return None
+    # An offsets file from before the context was last rewritten by hand is useless.
+    if offsets and offsets[-1][2] != os.path.getsize(context_path):
+        return None
+    return offsets
+
+
+def iter_context_pages(context_path):
+    """
+    Yields (page_number, text) from a context file without reading it all at once.
+    Older context files without offsets come back as one (None, text) pair, since
+    their page numbers are unknown.
+    """
+    offsets = load_page_offsets(context_path)
+    with open(context_path, 'rb') as f:
+        if offsets is None:
+            yield None, f.read().decode("utf-8")
+            return
+        for page_number, start, end in offsets:
+            f.seek(start)
+            yield page_number, f.read(end - start).decode("utf-8")
+
+
+def iter_text_pages(context_path, text):
+    """
+    Like iter_context_pages, but splits a copy of the file that was already read into
+    memory, so the pages are exactly that text even if the file has changed since.
+    """
+    data = text.encode("utf-8")
+    offsets = load_page_offsets(context_path)
+    if offsets is None or offsets[-1][2] != len(data):
+        yield None, text
+        return
+    for page_number, start, end in offsets:
+        yield page_number, data[start:end].decode("utf-8")
+
+
+def read_context_slice(context_path, first_page, last_page):
+    """Reads pages first_page..last_page (inclusive) of a context file."""
+    offsets = load_page_offsets(context_path)
+    if offsets is None:
+        with open(context_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    selected = [(start, end) for page_number, start, end in offsets if first_page <= page_number <= last_page]
+    if not selected:
+        return ""
+    with open(context_path, 'rb') as f:
+        f.seek(selected[0][0])
+        return f.read(selected[-1][1] - selected[0][0]).decode("utf-8")
@@ -0,0 +1,148 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+from context_files import iter_context_pages, iter_text_pages
+
+# --- Configuration ---
+INDEX_SUFFIX = ".chunks.json"
+INDEX_VERSION = 2          # Bump when chunking or tokenising changes so saved indexes are rebuilt
+CHUNK_CHARS = 2000         # About 500 tokens per passage
+TOP_K = 6
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Share of the question's terms the returned passages must contain; below it search()
+# returns nothing and the caller should send the whole report instead.
+MIN_QUERY_COVERAGE = 0.6
+
+# Dropped from questions: they match almost every passage and say nothing about what
+# to look for. Words that ask for the report as a whole ("summarize") are included, so
+# such questions fall back to the full report.
+STOP_WORDS = frozenset("""
+a about above after all also am an and any are as at be been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once
+only or other our out over own same she should so some such than that the their them then there
+these they this those through to too under until up very was we were what when where which while
+who whom why will with would you your
+tell show give explain describe please know say said
+summarize summarise summary overview report company
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def query_terms(query):
+    """The distinct terms of a question, without stop words."""
+    return {term for term in tokenize(query) if term not in STOP_WORDS}
+
+
+def index_path(context_path):
+    return context_path + INDEX_SUFFIX
+
+
+def chunk_pages(pages, max_chars=CHUNK_CHARS):
+    """
+    Splits (page_number, text) pairs into passages of about max_chars. A passage never
+    spans two pages; long pages are cut between paragraphs, or between lines when a
+    paragraph is itself too long. Passages keep their page_number, None included.
+    """
+    chunks = []
+    for page_number, page_text in pages:
+        blocks = re.split(r"\n\s*\n", page_text)
+        current = ""
+        for block in blocks:
+            lines = [block] if len(block) <= max_chars else block.splitlines(keepends=True)
+            for line in lines:
+                if current and len(current) + len(line) > max_chars:
+                    chunks.append({"page": page_number, "text": current.strip()})
+                    current = ""
+                current += line if line.endswith("\n") else line + "\n"
+        if current.strip():
+            chunks.append({"page": page_number, "text": current.strip()})
+    return chunks
+
+
+class ChunkIndex:
+    """
+    BM25 index over the passages of one context file, saved next to it as
+    <context>.chunks.json and rebuilt whenever the context file's size or mtime changes.
+    """
+
+    def __init__(self, chunks, source=None):
+        self.chunks = chunks
+        self.source = source or {}
+        self.term_counts = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        n = len(chunks)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    @staticmethod
+    def _source(context_path, stat=None):
+        stat = stat or os.stat(context_path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime, "version": INDEX_VERSION}
+
+    @classmethod
+    def build(cls, context_path, text=None, stat=None):
+        pages = iter_context_pages(context_path) if text is None else iter_text_pages(context_path, text)
+        return cls(chunk_pages(pages), cls._source(context_path, stat))
+
+    @classmethod
+    def for_context(cls, context_path, text=None, stat=None):
+        """
+        Loads the saved index if it still matches the context file, otherwise rebuilds and
+        saves it. A caller holding the file's text passes it with the os.stat taken when it
+        was read, so the index describes that text rather than whatever is on disk now.
+        """
+        source = cls._source(context_path, stat)
+        try:
+            with open(index_path(context_path), 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get("source") == source:
+                return cls(saved["chunks"], source)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: rebuilding unreadable chunk index for {context_path}: {e}")
+        index = cls.build(context_path, text, stat)
+        index.save(context_path)
+        return index
+
+    def save(self, context_path):
+        tmp_path = f"{index_path(context_path)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"source": self.source, "chunks": self.chunks}, f)
+        os.replace(tmp_path, index_path(context_path))
+
+    def search(self, query, k=TOP_K, min_coverage=MIN_QUERY_COVERAGE):
+        """
+        Returns the k best-matching passages (dicts with 'page' and 'text') in report
+        order, or [] when the question has no searchable terms or the passages found
+        contain fewer than min_coverage of them; 'page' is None if page numbers are unknown.
+        """
+        wanted = query_terms(query)
+        terms = [term for term in wanted if term in self.idf]
+        scored = []
+        for i, counts in enumerate(self.term_counts):
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term, 0)
+                if tf:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.average_length)
+                    score += self.idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, i))
+        best = sorted(scored, reverse=True)[:k]
+        covered = {term for _, i in best for term in terms if term in self.term_counts[i]}
+        if not wanted or len(covered) < min_coverage * len(wanted):
+            return []
+        return [self.chunks[i] for _, i in sorted(best, key=lambda item: item[1])]
@@ -0,0 +1,358 @@
+import os
+import json
+import queue
+import time
+import random
+import hashlib
+import threading
+from email.utils import formatdate
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+import pdf_store
+from rate_limit import TokenBucket
+
+# --- Configuration ---
+MAX_WORKERS = 8          # Total download threads shared by all hosts
+MAX_PER_HOST = 4         # Concurrent connections allowed against a single host
+REQUEST_TIMEOUT = 30
+CHUNK_SIZE = 8192
+MANIFEST_FILENAME = ".manifest.json"
+PARTIAL_SUFFIX = ".part"
+
+# Retry/backoff policy and per-host rate limit; see configure().
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0       # Seconds before the first retry, doubled on every further attempt
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {408, 416, 429, 500, 502, 503, 504}
+RATE_PER_HOST = 2.0      # Requests per second allowed against a single host
+RATE_BURST = 4
+
+# One pool of keep-alive sessions per host, plus a semaphore that caps how many
+# of them can be in use at the same time and a token bucket that paces them.
+_session_pools = {}
+_host_semaphores = {}
+_rate_limiters = {}
+_registry_lock = threading.Lock()
+# Optional semaphore shared between processes that bounds the total number of
+# downloads in flight (the orchestrator's global download budget).
+_global_slots = None
+
+
+def configure(max_retries=None, backoff_base=None, rate_per_host=None, rate_burst=None, global_slots=None):
+    """Overrides the retry policy, per-host rate limit and global download budget for this process."""
+    global MAX_RETRIES, BACKOFF_BASE, RATE_PER_HOST, RATE_BURST, _global_slots
+    if max_retries is not None:
+        MAX_RETRIES = max_retries
+    if backoff_base is not None:
+        BACKOFF_BASE = backoff_base
+    if rate_per_host is not None:
+        RATE_PER_HOST = rate_per_host
+    if rate_burst is not None:
+        RATE_BURST = rate_burst
+    if global_slots is not None:
+        _global_slots = global_slots
+
+
+def ensure_dir(path):
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+
+def filename_from_url(url):
+    """Derives a local file name from the last path segment of a URL."""
+    filename = url.split("/")[-1].split("?")[0]
+    if not filename.lower().endswith(".pdf"):
+        filename += ".pdf"
+    return filename
+
+
+def _host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PER_HOST)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _host_resources(host):
+    with _registry_lock:
+        if host not in _session_pools:
+            _session_pools[host] = queue.LifoQueue()
+            _host_semaphores[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+            _rate_limiters[host] = TokenBucket(RATE_PER_HOST, RATE_BURST)
+        return _session_pools[host], _host_semaphores[host], _rate_limiters[host]
+
+
+@contextmanager
+def host_session(url):
+    """Checks out a pooled session for the URL's host, respecting the per-host cap and rate limit."""
+    pool, semaphore, rate_limiter = _host_resources(_host_of(url))
+    with semaphore:
+        rate_limiter.acquire()
+        try:
+            session = pool.get_nowait()
+        except queue.Empty:
+            session = _new_session()
+        try:
+            yield session
+        finally:
+            pool.put(session)
+
+
+def close_sessions():
+    """Closes every pooled session (and with it the open keep-alive connections)."""
+    with _registry_lock:
+        for pool in _session_pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
+class Manifest:
+    """
+    Per-directory record of what was fetched from each URL (ETag, Last-Modified,
+    size and SHA-256), used to revalidate files with conditional requests.
+    """
+
+    def __init__(self, download_dir):
+        self.path = os.path.join(download_dir, MANIFEST_FILENAME)
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable manifest {self.path}: {e}")
+
+    def get(self, url):
+        with self._lock:
+            return self._entries.get(url)
+
+    def record(self, url, entry):
+        with self._lock:
+            self._entries[url] = entry
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def _conditional_headers(entry, local_path):
+    """Builds If-None-Match / If-Modified-Since headers for a file we already have."""
+    if not os.path.exists(local_path):
+        return {}
+    headers = {}
+    if entry and entry.get("filename") == os.path.basename(local_path):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    if not headers:
+        # File from before the manifest existed: fall back to its modification time.
+        headers["If-Modified-Since"] = formatdate(os.path.getmtime(local_path), usegmt=True)
+    return headers
+
+
+def _load_partial(part_path):
+    """Returns (bytes already on disk, validator metadata) for an interrupted download."""
+    if not os.path.exists(part_path):
+        return 0, {}
+    try:
+        with open(part_path + ".json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    if not (meta.get("etag") or meta.get("last_modified")):
+        # Without a validator we cannot prove the rest of the file matches what we have.
+        _discard_partial(part_path)
+        return 0, {}
+    return os.path.getsize(part_path), meta
+
+
+def _save_partial_meta(part_path, response_headers):
+    with open(part_path + ".json", 'w', encoding='utf-8') as f:
+        json.dump({"etag": response_headers.get("ETag"),
+                   "last_modified": response_headers.get("Last-Modified")}, f)
+
+
+def _discard_partial(part_path):
+    for path in (part_path, part_path + ".json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _expected_size(response):
+    """Total file size announced by the server, or None if it did not say."""
+    content_range = response.headers.get("Content-Range")
+    if response.status_code == 206 and content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and not response.headers.get("Content-Encoding"):
+        return int(content_length)
+    return None
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _is_retryable(error):
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    # Connection errors, timeouts and short reads (requests' exceptions are OSErrors too)
+    return isinstance(error, OSError)
+
+
+def _retry_delay(error, attempt):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(BACKOFF_MAX, int(retry_after)))
+    return delay
+
+
+@contextmanager
+def _download_slot():
+    if _global_slots is None:
+        yield
+    else:
+        with _global_slots:
+            yield
+
+
+def download_file(url, local_path, manifest):
+    """
+    Downloads or revalidates a single file. Returns 'downloaded', 'unchanged' or 'failed'.
+    Transient failures are retried with exponential backoff; each retry resumes the
+    partial file left by the previous attempt.
+    """
+    with _download_slot():
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return _download_once(url, local_path, manifest)
+            except Exception as e:
+                if attempt == MAX_RETRIES or not _is_retryable(e):
+                    print(f"Failed to download {url}: {e}")
+                    return "failed"
+                delay = _retry_delay(e, attempt)
+                print(f"Retrying {url} in {delay:.1f}s after error: {e}")
+                time.sleep(delay)
+
+
+def _download_once(url, local_path, manifest):
+    """
+    Data is streamed into a .part file that is resumed with a Range request after an
+    interruption and only renamed over local_path once its size has been verified.
+    """
+    entry = manifest.get(url)
+    part_path = local_path + PARTIAL_SUFFIX
+    resume_from, partial_meta = _load_partial(part_path)
+
+    headers = _conditional_headers(entry, local_path)
+    if resume_from:
+        headers["Range"] = f"bytes={resume_from}-"
+        headers["If-Range"] = partial_meta.get("etag") or partial_meta["last_modified"]
+
+    with host_session(url) as session:
+        with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as r:
+            if r.status_code == 304:
+                print(f"Unchanged: {local_path}")
+                return "unchanged"
+            if r.status_code == 416:
+                # Our partial file no longer fits the remote one; the retry starts over.
+                _discard_partial(part_path)
+            r.raise_for_status()
+
+            if r.status_code == 206:
+                print(f"Resuming {local_path} from byte {resume_from}")
+                digest = _hash_file(part_path)
+                size = resume_from
+                mode = 'ab'
+            else:
+                digest = hashlib.sha256()
+                size = 0
+                mode = 'wb'
+                _save_partial_meta(part_path, r.headers)
+
+            expected = _expected_size(r)
+            with open(part_path, mode) as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            if expected is not None and size != expected:
+                raise IOError(f"incomplete download ({size} of {expected} bytes), partial file kept for resume")
+            response_headers = r.headers
+
+    os.replace(part_path, local_path)
+    _discard_partial(part_path)
+
+    sha256 = digest.hexdigest()
+    try:
+        pdf_store.ingest(local_path, sha256)
+    except OSError as e:
+        print(f"Warning: could not add {local_path} to the PDF store: {e}")
+    manifest.record(url, {
+        "filename": os.path.basename(local_path),
+        "etag": response_headers.get("ETag") or partial_meta.get("etag"),
+        "last_modified": response_headers.get("Last-Modified") or partial_meta.get("last_modified"),
+        "size": size,
+        "sha256": sha256,
+    })
+    if entry and entry.get("sha256") == sha256:
+        print(f"Unchanged (same content): {local_path}")
+        return "unchanged"
+    print(f"Downloaded: {local_path}")
+    return "downloaded"
+
+
+def download_all(jobs, download_dir, max_workers=MAX_WORKERS):
+    """
+    Downloads a list of (url, filename) jobs into download_dir concurrently.
+    A filename of None falls back to the name in the URL.
+    Returns a dict mapping each status to the list of local paths that ended in it.
+    """
+    ensure_dir(download_dir)
+
+    # The same document is often linked more than once on a page; only fetch each target once.
+    targets = {}
+    for url, filename in jobs:
+        local_path = os.path.join(download_dir, filename or filename_from_url(url))
+        targets.setdefault(local_path, url)
+
+    results = {"downloaded": [], "unchanged": [], "failed": []}
+    if not targets:
+        return results
+
+    manifest = Manifest(download_dir)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(download_file, url, path, manifest): path for path, url in targets.items()}
+            for future in as_completed(futures):
+                results[future.result()].append(futures[future])
+    finally:
+        manifest.save()
+
+    print(f"{download_dir}: {len(results['downloaded'])} downloaded, "
+          f"{len(results['unchanged'])} unchanged, {len(results['failed'])} failed.")
+    return results
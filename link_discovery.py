@@ -0,0 +1,39 @@
+from bs4 import BeautifulSoup
+from download_manager import host_session
+
+# --- Configuration ---
+STATIC_FETCH_TIMEOUT = 15
+# Investor sites tend to serve a stripped page (or nothing) to clients without a browser user agent.
+STATIC_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml",
+}
+
+
+def fetch_static_html(url):
+    """Fetches a page with a plain HTTP request and parses it with lxml. Returns None on failure."""
+    try:
+        with host_session(url) as session:
+            r = session.get(url, headers=STATIC_HEADERS, timeout=STATIC_FETCH_TIMEOUT)
+            r.raise_for_status()
+            return BeautifulSoup(r.text, "lxml")
+    except Exception as e:
+        print(f"Static fetch of {url} failed: {e}")
+        return None
+
+
+def discover_links(url, parse_static, discover_with_browser):
+    """
+    Tries the cheap path first: fetch the initial HTML and let parse_static(soup, url)
+    pull the links out of it. parse_static returns None when the selectors it expects
+    are missing (i.e. the content is rendered by JavaScript), in which case
+    discover_with_browser() is used instead.
+    """
+    soup = fetch_static_html(url)
+    if soup is not None:
+        links = parse_static(soup, url)
+        if links:
+            print(f"Found {len(links)} links in static HTML of {url}; skipping the browser.")
+            return links
+    print(f"Expected content not in static HTML of {url}; falling back to the browser.")
+    return discover_with_browser()
@@ -0,0 +1,59 @@
+import os
+import json
+
+# --- Configuration ---
+LINK_INDEX_FILENAME = ".links.json"
+
+
+class LinkIndex:
+    """
+    Persistent record of the PDF links already discovered on a site, with the
+    (year, quarter, doc_type, filename) that were resolved for each of them.
+    Lives next to the downloads, e.g. pdf_downloads_alphabet/.links.json.
+    """
+
+    def __init__(self, download_dir):
+        self.download_dir = download_dir
+        self.path = os.path.join(download_dir, LINK_INDEX_FILENAME)
+        self._entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable link index {self.path}: {e}")
+        # Links known before this run; everything added later counts as new.
+        self._known = set(self._entries)
+
+    def __contains__(self, url):
+        return url in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url):
+        return self._entries.get(url)
+
+    def add(self, url, filename, year=None, quarter=None, doc_type=None):
+        self._entries[url] = {"year": year, "quarter": quarter, "doc_type": doc_type, "filename": filename}
+
+    def by_filename(self):
+        """Returns {filename: entry} for every recorded link."""
+        return {entry["filename"]: entry for entry in self._entries.values()}
+
+    def is_new(self, url):
+        return url not in self._known
+
+    def pending(self, links):
+        """Filters (url, filename) links down to those that are new or whose file is missing locally."""
+        return [(url, filename) for url, filename in links
+                if self.is_new(url) or not os.path.exists(os.path.join(self.download_dir, filename))]
+
+    def save(self):
+        if not os.path.exists(self.download_dir):
+            os.makedirs(self.download_dir)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
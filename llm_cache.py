@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# --- Configuration ---
+CACHE_DIR = "llm_cache"
+TTL_SECONDS = 30 * 24 * 3600     # Entries older than this are treated as misses
+MAX_ENTRIES = 500                 # Least recently used entries beyond this are evicted
+# Set LLM_CACHE_BYPASS=1 to always call the model (results are still stored).
+BYPASS = os.environ.get("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_lock = threading.Lock()
+
+
+def cache_key(model_name, generation_config, prompt_text):
+    """Key over (model, generation config, prompt hash); the prompt itself is not stored in the key."""
+    prompt_hash = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+    material = json.dumps({"model": model_name, "config": generation_config or {}, "prompt": prompt_hash},
+                          sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, key + ".json")
+
+
+def _count(name):
+    with _lock:
+        stats[name] += 1
+
+
+def get(model_name, generation_config, prompt_text, bypass=None, cache_dir=CACHE_DIR):
+    """Returns the cached response text, or None on a miss, an expired entry or when bypassed."""
+    if BYPASS if bypass is None else bypass:
+        _count("misses")
+        return None
+    path = _entry_path(cache_key(model_name, generation_config, prompt_text), cache_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        _count("misses")
+        return None
+    # Another thread or process may evict the entry at any moment; that is just a miss.
+    if time.time() - entry.get("created", 0) > TTL_SECONDS:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        _count("misses")
+        return None
+    try:
+        os.utime(path)  # Mark as recently used for LRU eviction
+    except FileNotFoundError:
+        _count("misses")
+        return None
+    _count("hits")
+    return entry["response"]
+
+
+def put(model_name, generation_config, prompt_text, response_text, cache_dir=CACHE_DIR):
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(cache_key(model_name, generation_config, prompt_text), cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"model": model_name, "config": generation_config, "created": time.time(),
+                   "response": response_text}, f)
+    os.replace(tmp_path, path)
+    _count("stores")
+    evict(cache_dir)
+
+
+def _mtime_or_zero(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0   # Already removed elsewhere; sorting it first makes the remove below a no-op
+
+
+def evict(cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES):
+    """Drops the least recently used entries beyond max_entries."""
+    entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".json")]
+    if len(entries) <= max_entries:
+        return
+    entries.sort(key=_mtime_or_zero)
+    for path in entries[:len(entries) - max_entries]:
+        try:
+            os.remove(path)
+            _count("evictions")
+        except FileNotFoundError:
+            pass
+
+
+def format_stats():
+    with _lock:
+        lookups = stats["hits"] + stats["misses"]
+        rate = (100.0 * stats["hits"] / lookups) if lookups else 0.0
+        return (f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({rate:.0f}% hit rate), "
+                f"{stats['stores']} stored, {stats['evictions']} evicted")
@@ -0,0 +1,222 @@
+import os
+import time
+import random
+import hashlib
+import threading
+from contextlib import contextmanager
+import google.generativeai as genai
+from google.generativeai.types import HarmCategory, HarmBlockThreshold
+from google.api_core import exceptions as google_exceptions
+from rate_limit import TokenBucket
+
+# --- Configuration ---
+# LLM_BACKEND=stub answers every call locally (no network, no API key), for load tests
+# of the webapp and the pipeline. LLM_STUB_LATENCY sets its simulated latency in seconds.
+BACKEND = os.environ.get("LLM_BACKEND", "gemini").lower()
+STUB_LATENCY = float(os.environ.get("LLM_STUB_LATENCY", "0.2"))
+DEFAULT_MODEL = "gemini-1.5-flash-latest"
+REQUEST_TIMEOUT = 300          # Seconds per model call; full reports can take a while
+MAX_RETRIES = 3                # Retries for quota (429) and transient server errors
+BACKOFF_BASE = 2.0             # Seconds; doubled on every retry
+BACKOFF_MAX = 60
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+}
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+_api_key = None
+_models = {}                   # model name -> long-lived GenerativeModel (or stub)
+_models_lock = threading.Lock()
+_slots = None                  # Optional BoundedSemaphore limiting calls in flight
+_rate = None                   # Optional TokenBucket limiting calls per minute
+metrics = {}                   # model name -> counters, see _record
+_metrics_lock = threading.Lock()
+
+
+def configure(api_key=None, timeout=None, max_retries=None, concurrency=None, requests_per_minute=None):
+    """Sets the API key and, optionally, the timeout, retry policy and shared rate limits for this process."""
+    global _api_key, REQUEST_TIMEOUT, MAX_RETRIES, _slots, _rate
+    if api_key is not None and api_key != _api_key:
+        _api_key = api_key
+        if is_available() and BACKEND != "stub":
+            # genai.configure swaps a process-wide client, so it happens here once, not per call.
+            genai.configure(api_key=api_key)
+        with _models_lock:
+            _models.clear()
+    if timeout is not None:
+        REQUEST_TIMEOUT = timeout
+    if max_retries is not None:
+        MAX_RETRIES = max_retries
+    if concurrency is not None:
+        _slots = threading.BoundedSemaphore(concurrency)
+    if requests_per_minute is not None:
+        _rate = TokenBucket(requests_per_minute / 60.0, 1)
+
+
+def is_available():
+    """True if calls can be made: the stub backend, or a real (non-placeholder) API key."""
+    return BACKEND == "stub" or bool(_api_key and _api_key != "YOUR_GOOGLE_API_KEY")
+
+
+class _StubResponse:
+    def __init__(self, text, prompt_tokens, output_tokens):
+        self.text = text
+        self.usage_metadata = type("Usage", (), {"prompt_token_count": prompt_tokens,
+                                                 "candidates_token_count": output_tokens})()
+
+
+class StubModel:
+    """Offline stand-in for GenerativeModel: deterministic answers after a simulated delay."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def generate_content(self, prompt_text, stream=False, **kwargs):
+        digest = hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()[:12]
+        text = (f"[stub {self.model_name}] Deterministic offline response {digest} "
+                f"for a {len(prompt_text)}-character prompt.")
+        if stream:
+            return self._stream(text, len(prompt_text) // 4)
+        time.sleep(STUB_LATENCY)
+        return _StubResponse(text, len(prompt_text) // 4, len(text) // 4)
+
+    @staticmethod
+    def _stream(text, prompt_tokens):
+        """Yields the answer word by word, spreading STUB_LATENCY over the words."""
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(STUB_LATENCY / len(words))
+            yield _StubResponse(word if i == 0 else " " + word, prompt_tokens, len(text) // 4)
+
+
+def get_model(model_name):
+    """Returns the process-wide client for a model, creating it on first use."""
+    with _models_lock:
+        if model_name not in _models:
+            _models[model_name] = StubModel(model_name) if BACKEND == "stub" else genai.GenerativeModel(model_name)
+        return _models[model_name]
+
+
+def _record(model_name, latency, response=None, error=False, retries=0):
+    usage = getattr(response, "usage_metadata", None)
+    with _metrics_lock:
+        m = metrics.setdefault(model_name, {"calls": 0, "errors": 0, "retries": 0, "seconds": 0.0,
+                                            "prompt_tokens": 0, "output_tokens": 0})
+        m["calls"] += 1
+        m["errors"] += error
+        m["retries"] += retries
+        m["seconds"] += latency
+        if usage is not None:
+            m["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+            m["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+
+
+@contextmanager
+def _call_slot():
+    if _slots is None:
+        yield
+    else:
+        with _slots:
+            yield
+
+
+def _request_kwargs(generation_config, stream=False):
+    kwargs = {"safety_settings": SAFETY_SETTINGS, "request_options": {"timeout": REQUEST_TIMEOUT}}
+    if generation_config:
+        kwargs["generation_config"] = genai.types.GenerationConfig(**generation_config)
+    if stream:
+        kwargs["stream"] = True
+    return kwargs
+
+
+def _call_with_retries(model_name, task_description, attempt):
+    """
+    The retry loop shared by generate and generate_stream. attempt() makes one model
+    call and yields (text, response) pieces, whose text is passed on as it arrives.
+    Every attempt waits for the requests-per-minute limit and a concurrency slot; quota
+    and transient server errors are retried with exponential backoff as long as no text
+    has been passed on yet, and the call is recorded in `metrics` once it ends.
+    """
+    started = time.monotonic()
+    for attempt_number in range(MAX_RETRIES + 1):
+        if _rate is not None and BACKEND != "stub":  # The quota belongs to the real API
+            _rate.acquire()
+        response = None
+        yielded = False
+        try:
+            with _call_slot():
+                for text, response in attempt():
+                    if text:
+                        yielded = True
+                        yield text
+        except RETRYABLE_ERRORS as e:
+            if yielded or attempt_number == MAX_RETRIES:
+                _record(model_name, time.monotonic() - started, error=True, retries=attempt_number)
+                raise
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt_number)) * random.uniform(0.5, 1.0)
+            print(f"{task_description}: {type(e).__name__}, retrying in {delay:.1f}s "
+                  f"(attempt {attempt_number + 1}/{MAX_RETRIES})")
+            time.sleep(delay)
+        except Exception:
+            _record(model_name, time.monotonic() - started, error=True, retries=attempt_number)
+            raise
+        else:
+            # Streamed chunks carry running usage totals, so the last response has the full count.
+            _record(model_name, time.monotonic() - started, response, retries=attempt_number)
+            return
+
+
+def generate(prompt_text, model_name=DEFAULT_MODEL, generation_config=None, task_description="LLM call"):
+    """
+    Runs one generation and returns its text. Calls stay within the configured
+    concurrency and requests-per-minute limits, quota and transient server errors are
+    retried with exponential backoff, and latency and token counts are recorded in
+    `metrics`. Raises the last error if every attempt fails.
+    """
+    model = get_model(model_name)
+    kwargs = _request_kwargs(generation_config)
+
+    def attempt():
+        response = model.generate_content(prompt_text, **kwargs)
+        yield response.text, response
+
+    return "".join(_call_with_retries(model_name, task_description, attempt))
+
+
+def generate_stream(prompt_text, model_name=DEFAULT_MODEL, generation_config=None, task_description="LLM call"):
+    """
+    Like generate, but yields the answer's text piece by piece as the model produces it.
+    Errors before the first piece are retried like in generate; once text has been
+    yielded an error is raised to the caller, since the partial answer cannot be taken back.
+    """
+    model = get_model(model_name)
+    kwargs = _request_kwargs(generation_config, stream=True)
+
+    def attempt():
+        for chunk in model.generate_content(prompt_text, **kwargs):
+            yield chunk.text, chunk
+
+    yield from _call_with_retries(model_name, task_description, attempt)
+
+
+def snapshot_metrics():
+    with _metrics_lock:
+        return {name: dict(m) for name, m in metrics.items()}
+
+
+def format_metrics():
+    lines = []
+    for name, m in sorted(snapshot_metrics().items()):
+        average = m["seconds"] / m["calls"] if m["calls"] else 0.0
+        lines.append(f"LLM {name} ({BACKEND}): {m['calls']} calls, {m['errors']} errors, {m['retries']} retries, "
+                     f"{average:.2f}s average, {m['prompt_tokens']} prompt / {m['output_tokens']} output tokens")
+    return "\n".join(lines) or f"LLM ({BACKEND}): no calls made"
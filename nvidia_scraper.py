@@ -1,14 +1,16 @@
 import os
-import time
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+from urllib.parse import urljoin
 from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+from browser_pool import browser, load_page
+from download_manager import download_all
+from link_discovery import discover_links
 
 NVIDIA_URL = "https://investor.nvidia.com/financial-info/financial-reports/"
 DOWNLOAD_DIR = "pdf_downloads_nvidia"
+# The financial-reports table (a Q4 module, like Airbnb's) is rendered client-side;
+# nav and footer PDFs can be present long before it.
+REPORT_LINK_SELECTOR = ("[class*='module-financial-table'] a[href*='.pdf'], "
+                        "[class*='module-financial-report'] a[href*='.pdf']")
 
 def ensure_dir(path):
     if not os.path.exists(path):
@@ -17,56 +19,48 @@ def ensure_dir(path):
 def sanitize_filename(name):
     return "".join(c if c.isalnum() or c in (' ', '.', '_', '-') else "_" for c in name).strip()
 
-def download_pdf(url, download_dir):
+def pdf_filename(url):
     filename = sanitize_filename(url.split("/")[-1].split("?")[0])
     if not filename.lower().endswith(".pdf"):
         filename += ".pdf"
-    local_path = os.path.join(download_dir, filename)
-    if os.path.exists(local_path):
-        print(f"Already downloaded: {local_path}")
-        return
+    return filename
+
+def parse_static_links(soup, base_url):
+    """
+    Same selection as the browser path: every <a> whose href contains .pdf, but only
+    once the static HTML already has report links inside the financial-reports table.
+    """
+    if not soup.select(REPORT_LINK_SELECTOR):
+        return None
+    hrefs = [urljoin(base_url, a["href"]) for a in soup.find_all("a", href=True) if ".pdf" in a["href"]]
+    return [(href, pdf_filename(href)) for href in hrefs] or None
+
+def discover_with_browser():
     try:
-        r = requests.get(url, stream=True, timeout=20)
-        r.raise_for_status()
-        with open(local_path, 'wb') as f:
-            for chunk in r.iter_content(8192):
-                f.write(chunk)
-        print(f"Downloaded: {local_path}")
+        with browser() as driver:
+            # Wait for the table to load
+            if not load_page(driver, NVIDIA_URL, REPORT_LINK_SELECTOR):
+                return []
+
+            # Find all <a> tags with .pdf in href
+            all_links = driver.find_elements(By.XPATH, "//a[contains(@href, '.pdf')]")
+            pdf_links = [link.get_attribute("href") for link in all_links if link.get_attribute("href")]
+            return [(link, pdf_filename(link)) for link in pdf_links]
     except Exception as e:
-        print(f"Failed to download {url}: {e}")
+        print(f"Error during scraping: {e}")
+        return []
 
 def scrape_nvidia():
     ensure_dir(DOWNLOAD_DIR)
 
-    chrome_options = Options()
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1200,1000")
-
     print(f"Scraping {NVIDIA_URL}")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-
-    try:
-        driver.get(NVIDIA_URL)
-        time.sleep(5)
-
-        # Wait for the table to load
-        time.sleep(2)
-
-        # Find all <a> tags with .pdf in href
-        all_links = driver.find_elements(By.XPATH, "//a[contains(@href, '.pdf')]")
-        pdf_links = [link.get_attribute("href") for link in all_links if link.get_attribute("href")]
+    pdf_links = discover_links(NVIDIA_URL, parse_static_links, discover_with_browser)
 
-        if not pdf_links:
-            print("No PDF links found.")
-        else:
-            print(f"Found {len(pdf_links)} PDF links.")
-            for link in pdf_links:
-                download_pdf(link, DOWNLOAD_DIR)
-
-    except Exception as e:
-        print(f"Error during scraping: {e}")
-    finally:
-        driver.quit()
+    if not pdf_links:
+        print("No PDF links found.")
+        return {}
+    print(f"Found {len(pdf_links)} PDF links.")
+    return download_all(pdf_links, DOWNLOAD_DIR)
 
 if __name__ == "__main__":
     scrape_nvidia()
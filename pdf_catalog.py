@@ -0,0 +1,191 @@
+import os
+import re
+import time
+import sqlite3
+import pdf_store
+from link_index import LinkIndex
+
+# --- Configuration ---
+CATALOG_PATH = "pdf_catalog.sqlite3"
+FOLDER_PREFIX = "pdf_downloads_"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    company TEXT NOT NULL,
+    fiscal_year INTEGER,
+    quarter INTEGER,
+    doc_type TEXT,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pdfs_latest ON pdfs (company, doc_type, fiscal_year, quarter);
+CREATE INDEX IF NOT EXISTS pdfs_sha256 ON pdfs (sha256);
+"""
+
+# Tried in order; the first that matches gives the fiscal year.
+_FISCAL_YEAR_PATTERNS = [
+    (re.compile(r"FY[-_ ]?((?:19|20)\d{2})(?!\d)", re.IGNORECASE), lambda y: int(y)),       # FY2025
+    (re.compile(r"FY[-_ ]?(\d{2})(?!\d)", re.IGNORECASE), lambda y: 2000 + int(y)),         # Q1FY26, FY25_Q2
+    (re.compile(r"F[1-4]Q(\d{2})(?!\d)", re.IGNORECASE), lambda y: 2000 + int(y)),          # F1Q25
+    (re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)"), lambda y: int(y)),                        # 2025_Q1, Q1-2025
+    (re.compile(r"Q[1-4][-_ ]?(\d{2})(?!\d)", re.IGNORECASE), lambda y: 2000 + int(y)),     # Q1-25
+]
+_QUARTER_PATTERNS = [
+    re.compile(r"F([1-4])Q", re.IGNORECASE),                        # F1Q25
+    re.compile(r"(?<![A-Za-z])Q([1-4])(?!\d{3})", re.IGNORECASE),   # Q1, not Q2025
+    re.compile(r"(?<![\dA-Za-z])([1-4])Q(?![A-Za-z])", re.IGNORECASE),
+]
+# Which of a quarter's documents to summarise: the first type listed wins, unknown types
+# come last, and the path breaks any remaining tie so the choice never depends on mtimes.
+DOC_TYPE_PREFERENCE = ["10-Q", "10-K", "earnings release", "shareholder letter", "financial statements",
+                       "presentation", "CFO commentary", "transcript"]
+_DOC_TYPE_PATTERNS = [
+    (re.compile(r"10[-_ ]?Q", re.IGNORECASE), "10-Q"),
+    (re.compile(r"10[-_ ]?K", re.IGNORECASE), "10-K"),
+    (re.compile(r"shareholder|letter", re.IGNORECASE), "shareholder letter"),
+    (re.compile(r"CFO|commentary", re.IGNORECASE), "CFO commentary"),
+    (re.compile(r"transcript", re.IGNORECASE), "transcript"),
+    (re.compile(r"presentation|slides|deck", re.IGNORECASE), "presentation"),
+    (re.compile(r"financial[-_ ]?statements", re.IGNORECASE), "financial statements"),
+    (re.compile(r"update|release|results|earnings", re.IGNORECASE), "earnings release"),
+]
+
+
+def connect(path=CATALOG_PATH):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def company_from_folder(folder):
+    return os.path.basename(os.path.normpath(folder)).replace(FOLDER_PREFIX, '').upper()
+
+
+def parse_filename(filename):
+    """Returns (fiscal_year, quarter, doc_type) guessed from a file name; unknown parts are None."""
+    stem = os.path.splitext(filename)[0]
+    fiscal_year = None
+    for pattern, to_year in _FISCAL_YEAR_PATTERNS:
+        match = pattern.search(stem)
+        if match:
+            fiscal_year = to_year(match.group(1))
+            break
+    quarter = None
+    for pattern in _QUARTER_PATTERNS:
+        match = pattern.search(stem)
+        if match:
+            quarter = int(match.group(1))
+            break
+    doc_type = next((name for pattern, name in _DOC_TYPE_PATTERNS if pattern.search(stem)), None)
+    return fiscal_year, quarter, doc_type
+
+
+def _link_metadata(entry):
+    """(fiscal_year, quarter, doc_type) recorded by a scraper's link index; unknown parts are None."""
+    year = str(entry.get("year") or "")
+    quarter = re.search(r"[1-4]", str(entry.get("quarter") or ""))
+    doc_type = entry.get("doc_type")
+    return (int(year) if year.isdigit() else None,
+            int(quarter.group(0)) if quarter else None,
+            doc_type.replace("_", " ") if doc_type else None)
+
+
+def describe(path, folder, links):
+    """Catalog metadata for one PDF: the scraper's link index wins over file name guesses."""
+    rel_name = os.path.relpath(path, folder)
+    guessed = parse_filename(os.path.basename(path))
+    if rel_name in links:
+        recorded = _link_metadata(links[rel_name])
+        # Keep the file name guess for anything the scraper did not know.
+        return tuple(r if r is not None else g for r, g in zip(recorded, guessed))
+    return guessed
+
+
+def scan(folders, conn):
+    """
+    Brings the catalog up to date with the given folders. Every PDF is stat'ed, but
+    only new or changed files (by size and mtime) are hashed, stored and parsed, and
+    each directory's name index is written once, so a scan costs O(files) stats plus
+    O(changes) hashing. Afterwards, blobs in the PDF store that no file links to any
+    more are deleted. Returns {"added": n, "updated": n, "removed": n, "blobs_removed": n}.
+    """
+    counts = {"added": 0, "updated": 0, "removed": 0}
+    now = time.time()
+    with conn:
+        for folder in folders:
+            if not os.path.isdir(folder):
+                counts["removed"] += conn.execute("DELETE FROM pdfs WHERE folder = ?", (folder,)).rowcount
+                continue
+            links = None
+            company = company_from_folder(folder)
+            rows = {row["path"]: row for row in conn.execute(
+                "SELECT path, size, mtime FROM pdfs WHERE folder = ?", (folder,))}
+            seen = set()
+            for dirpath, _, filenames in os.walk(folder):
+                changed = []
+                for name in filenames:
+                    if not name.lower().endswith(".pdf"):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    seen.add(path)
+                    stat = os.stat(path)
+                    row = rows.get(path)
+                    if not row or row["size"] != stat.st_size or row["mtime"] != stat.st_mtime:
+                        changed.append(name)
+                if not changed:
+                    continue
+                if links is None:
+                    links = LinkIndex(folder).by_filename()
+                # Keep the content-addressed store in step; this may turn files into hard links.
+                hashes = pdf_store.ingest_many(dirpath, changed)
+                for name, sha256 in hashes.items():
+                    path = os.path.join(dirpath, name)
+                    stat = os.stat(path)
+                    fiscal_year, quarter, doc_type = describe(path, folder, links)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO pdfs (path, folder, company, fiscal_year, quarter, doc_type,"
+                        " size, mtime, sha256, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (path, folder, company, fiscal_year, quarter, doc_type,
+                         stat.st_size, stat.st_mtime, sha256, now))
+                    counts["updated" if path in rows else "added"] += 1
+            for path in set(rows) - seen:
+                conn.execute("DELETE FROM pdfs WHERE path = ?", (path,))
+                counts["removed"] += 1
+    referenced = {row["sha256"] for row in conn.execute("SELECT DISTINCT sha256 FROM pdfs")}
+    counts["blobs_removed"] = pdf_store.collect_garbage(referenced)
+    return counts
+
+
+def latest_reports(conn, companies=None, doc_type=None, start_year=None, end_year=None):
+    """
+    Returns {company: row} with each company's most recent filing, by fiscal year,
+    then quarter (annual filings without a quarter count as the year's end), then
+    DOC_TYPE_PREFERENCE, then path. doc_type narrows it down, e.g. doc_type="10-Q".
+    """
+    query = "SELECT * FROM pdfs WHERE fiscal_year IS NOT NULL"
+    params = []
+    if companies:
+        query += " AND company IN (%s)" % ",".join("?" * len(companies))
+        params += [c.upper() for c in companies]
+    if doc_type:
+        query += " AND doc_type = ?"
+        params.append(doc_type)
+    if start_year is not None:
+        query += " AND fiscal_year >= ?"
+        params.append(start_year)
+    if end_year is not None:
+        query += " AND fiscal_year <= ?"
+        params.append(end_year)
+    preference = " ".join(f"WHEN ? THEN {rank}" for rank in range(len(DOC_TYPE_PREFERENCE)))
+    query += (" ORDER BY company, fiscal_year DESC, COALESCE(quarter, 5) DESC,"
+              f" CASE doc_type {preference} ELSE {len(DOC_TYPE_PREFERENCE)} END, path")
+    params += DOC_TYPE_PREFERENCE
+    latest = {}
+    for row in conn.execute(query, params):
+        latest.setdefault(row["company"], row)
+    return latest
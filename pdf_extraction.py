@@ -0,0 +1,129 @@
+import os
+import json
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import PyPDF2
+from PyPDF2 import PdfReader
+import pdf_store
+
+# --- Configuration ---
+EXTRACTION_WORKERS = os.cpu_count() or 1
+PAGES_PER_TASK = 8       # Pages handed to a worker at a time; small enough to balance, big enough to amortise opening the PDF
+MAX_TASKS_IN_FLIGHT = EXTRACTION_WORKERS * 2   # Bounds how many extracted page ranges wait in memory
+# Bump EXTRACTOR_VERSION whenever extraction output changes so stale cache entries are ignored.
+EXTRACTOR_VERSION = f"1-pypdf2-{PyPDF2.__version__}"
+CACHE_DIR = "extraction_cache"
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+
+def _extract_page_range(pdf_path, start, end):
+    """Worker: extracts pages [start, end) of one PDF. A failing page yields None, not an error."""
+    reader = PdfReader(pdf_path)
+    pages = []
+    for page_num in range(start, end):
+        try:
+            pages.append(reader.pages[page_num].extract_text())
+        except Exception as e_page:
+            print(f"Error extracting text from page {page_num + 1} of {pdf_path}: {e_page}")
+            pages.append(None)
+    return pages
+
+
+def _page_ranges(num_pages, pages_per_task=PAGES_PER_TASK):
+    return [(start, min(start + pages_per_task, num_pages)) for start in range(0, num_pages, pages_per_task)]
+
+
+def cache_path(pdf_path, cache_dir=CACHE_DIR):
+    key = f"{pdf_store.cached_sha256(pdf_path)}-{EXTRACTOR_VERSION}"
+    return os.path.join(cache_dir, key + ".jsonl")
+
+
+def _iter_cached_pages(path):
+    os.utime(path)  # Mark as recently used for eviction
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            yield entry["page"], entry["text"]
+
+
+def evict_cache(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Deletes the least recently used cache entries until the cache fits in max_bytes."""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+def iter_pdf_pages(pdf_path, executor=None, max_workers=EXTRACTION_WORKERS, use_cache=True):
+    """
+    Yields (page_number, text) in page order; text is None for pages that failed.
+    Results come from the on-disk extraction cache (keyed by the PDF's content hash
+    and EXTRACTOR_VERSION) when possible. Otherwise page ranges run on a process
+    pool and the pages are written to the cache as they are yielded.
+    """
+    if not use_cache:
+        yield from _iter_extracted_pages(pdf_path, executor, max_workers)
+        return
+
+    path = cache_path(pdf_path)
+    if os.path.exists(path):
+        print(f"Using cached text for: {pdf_path}")
+        yield from _iter_cached_pages(path)
+        return
+
+    pdf_store.ensure_dir(CACHE_DIR)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for page_number, page_text in _iter_extracted_pages(pdf_path, executor, max_workers):
+                f.write(json.dumps({"page": page_number, "text": page_text}) + "\n")
+                yield page_number, page_text
+        # Only a fully consumed extraction becomes a cache entry.
+        os.replace(tmp_path, path)
+        evict_cache()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _iter_extracted_pages(pdf_path, executor=None, max_workers=EXTRACTION_WORKERS):
+    """
+    Page ranges run on a process pool (the given executor, or a private one), with
+    at most MAX_TASKS_IN_FLIGHT ranges extracted ahead of the consumer, so memory
+    stays bounded however long the document is.
+    """
+    num_pages = len(PdfReader(pdf_path).pages)
+    if executor is None and (num_pages <= PAGES_PER_TASK or max_workers <= 1):
+        # Not worth starting processes for a short document
+        for offset, page_text in enumerate(_extract_page_range(pdf_path, 0, num_pages)):
+            yield offset + 1, page_text
+        return
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        ranges = iter(_page_ranges(num_pages))
+        pending = deque((start, executor.submit(_extract_page_range, pdf_path, start, end))
+                        for start, end in islice(ranges, MAX_TASKS_IN_FLIGHT))
+        while pending:
+            start, future = pending.popleft()
+            next_range = next(ranges, None)
+            if next_range:
+                pending.append((next_range[0], executor.submit(_extract_page_range, pdf_path, *next_range)))
+            for offset, page_text in enumerate(future.result()):
+                yield start + offset + 1, page_text
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
@@ -0,0 +1,156 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+# --- Configuration ---
+STORE_DIR = "pdf_store"
+NAME_INDEX_FILENAME = ".index.json"
+
+# Name indexes are read-modify-written by several download threads at once.
+_index_lock = threading.Lock()
+
+
+def ensure_dir(path):
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_sha256(path):
+    """SHA-256 of a file, taken from its folder's name index when that entry is still current."""
+    folder, name = os.path.split(path)
+    entry = load_name_index(folder).get(name)
+    stat = os.stat(path)
+    if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return entry["sha256"]
+    return file_sha256(path)
+
+
+def blob_path(sha256, store_dir=STORE_DIR):
+    """Blobs are sharded by the first two hex digits: pdf_store/ab/ab12....pdf"""
+    return os.path.join(store_dir, sha256[:2], sha256 + ".pdf")
+
+
+def _index_path(folder):
+    return os.path.join(folder, NAME_INDEX_FILENAME)
+
+
+def load_name_index(folder):
+    """Returns the folder's {filename: {"sha256", "size", "mtime"}} index."""
+    try:
+        with open(_index_path(folder), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning: rebuilding unreadable name index in {folder}: {e}")
+        return {}
+
+
+def _save_name_index(folder, index):
+    tmp_path = _index_path(folder) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, _index_path(folder))
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Filesystems without hard links (or across devices) get a real copy instead.
+        shutil.copy2(src, dst)
+
+
+def _store(path, sha256, store_dir, previous=None):
+    """
+    Makes sure the blob exists and that path shares its storage. Blobs are read-only,
+    so writing into a company file in place fails instead of silently changing the
+    blob behind every other name linked to it; downloads replace files with os.replace,
+    which gives the name a new inode and leaves the blob alone.
+    """
+    if previous and previous != sha256:
+        old_blob = blob_path(previous, store_dir)
+        if os.path.exists(old_blob) and os.path.samefile(old_blob, path):
+            # The file was rewritten in place through its link, so the old blob no
+            # longer holds the bytes its name promises. Drop it; path becomes the new blob.
+            print(f"Warning: {path} was modified in place; discarding its corrupted blob {previous}")
+            os.remove(old_blob)
+    blob = blob_path(sha256, store_dir)
+    if not os.path.exists(blob):
+        ensure_dir(os.path.dirname(blob))
+        _link_or_copy(path, blob)
+        os.chmod(blob, 0o444)
+    elif not os.path.samefile(blob, path):
+        # Same bytes already stored under another name: point this name at the existing blob.
+        tmp_path = path + ".link"
+        _link_or_copy(blob, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def ingest(path, sha256=None, store_dir=STORE_DIR):
+    """
+    Adds a downloaded PDF to the content-addressed store and records name -> hash in
+    its folder's name index. The file in the company folder becomes a read-only hard
+    link to the blob, so a document reached under several names or sites is stored once.
+    Returns the SHA-256.
+    """
+    folder, name = os.path.split(path)
+    return ingest_many(folder, {name: sha256}, store_dir)[name]
+
+
+def ingest_many(folder, names, store_dir=STORE_DIR):
+    """
+    ingest for several files of one folder, reading and writing its name index once.
+    names maps file name -> SHA-256, or None to hash the file unless its index entry
+    still matches its size and mtime; a plain list of names means None for all.
+    Returns {name: sha256}.
+    """
+    if not isinstance(names, dict):
+        names = dict.fromkeys(names)
+    with _index_lock:
+        index = load_name_index(folder)
+    updates = {}
+    for name, sha256 in names.items():
+        path = os.path.join(folder, name)
+        entry = index.get(name)
+        if sha256 is None:
+            stat = os.stat(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                sha256 = entry["sha256"]
+            else:
+                sha256 = file_sha256(path)
+        _store(path, sha256, store_dir, entry and entry["sha256"])
+        stat = os.stat(path)
+        updates[name] = {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime}
+    with _index_lock:
+        # Re-read under the lock so entries written by download threads meanwhile survive.
+        index = load_name_index(folder)
+        index.update(updates)
+        _save_name_index(folder, index)
+    return {name: entry["sha256"] for name, entry in updates.items()}
+
+
+def collect_garbage(referenced=(), store_dir=STORE_DIR):
+    """
+    Deletes blobs that no company folder links to any more and returns how many went.
+    Blobs whose hash is in referenced are always kept, which protects stores that
+    fell back to copies (their blobs never have a second link).
+    """
+    removed = 0
+    for dirpath, _, filenames in os.walk(store_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.splitext(name)[0] not in referenced and os.stat(path).st_nlink == 1:
+                os.remove(path)
+                removed += 1
+    return removed
@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import multiprocessing
+import multiprocessing.util
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import download_manager
+import browser_pool
+
+# --- Configuration ---
+# Site name -> (module, scrape function). Every scrape function returns the
+# download_all() result dict for its site; scrapers that only download links they
+# have not seen before also report how many they found under "found".
+SITES = {
+    "airbnb": ("airbnb_scraper", "scrape_airbnb_pdfs"),
+    "alphabet": ("alphabet_scraper", "scrape_all_pdfs"),
+    "apple": ("apple_scraper", "scrape_apple"),
+    "nvidia": ("nvidia_scraper", "scrape_nvidia"),
+    "tesla": ("tesla_scraper", "scrape_tesla"),
+}
+# Scrapers that keep a link index; refresh=True makes them revalidate every known link.
+REFRESHABLE_SITES = {"airbnb", "alphabet"}
+REPORT_DIR = "scrape_reports"
+DEFAULT_DOWNLOAD_BUDGET = 12   # Downloads in flight across all worker processes
+
+
+def _init_worker(global_slots, max_retries, backoff_base, rate_per_host, rate_burst):
+    download_manager.configure(
+        max_retries=max_retries,
+        backoff_base=backoff_base,
+        rate_per_host=rate_per_host,
+        rate_burst=rate_burst,
+        global_slots=global_slots,
+    )
+    # atexit handlers never run in pool workers, so the worker's Chrome sessions are
+    # quit by a multiprocessing finalizer when it shuts down instead.
+    multiprocessing.util.Finalize(None, browser_pool.close, exitpriority=10)
+
+
+def run_site(site, refresh=False):
+    """Runs one site's scraper inside a worker process and returns its report entry."""
+    module_name, function_name = SITES[site]
+    started = time.monotonic()
+    report = {"site": site, "found": 0, "downloaded": 0, "unchanged": 0, "failed": 0, "error": None}
+    try:
+        scrape = getattr(importlib.import_module(module_name), function_name)
+        results = (scrape(refresh=True) if refresh and site in REFRESHABLE_SITES else scrape()) or {}
+        for status in ("downloaded", "unchanged", "failed"):
+            report[status] = len(results.get(status, []))
+        report["found"] = results.get("found", report["downloaded"] + report["unchanged"] + report["failed"])
+        report["failed_files"] = results.get("failed", [])
+    except Exception as e:
+        print(f"Scraper for {site} crashed: {e}")
+        report["error"] = str(e)
+    finally:
+        # Pages and downloads of one site share keep-alive sessions; nothing reuses them afterwards.
+        download_manager.close_sessions()
+    report["seconds"] = round(time.monotonic() - started, 2)
+    return report
+
+
+def run_all(sites, workers, download_budget, max_retries, backoff_base, rate_per_host, rate_burst,
+            refresh=False):
+    """Scrapes the given sites in parallel worker processes and returns the run report."""
+    started = time.monotonic()
+    with multiprocessing.Manager() as manager:
+        global_slots = manager.BoundedSemaphore(download_budget)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(global_slots, max_retries, backoff_base, rate_per_host, rate_burst),
+        ) as executor:
+            futures = {executor.submit(run_site, site, refresh): site for site in sites}
+            site_reports = []
+            for future in as_completed(futures):
+                try:
+                    site_reports.append(future.result())
+                except Exception as e:
+                    # The worker process itself died (e.g. Chrome took it down).
+                    site_reports.append({"site": futures[future], "found": 0, "downloaded": 0,
+                                         "unchanged": 0, "failed": 0, "error": str(e)})
+
+    site_reports.sort(key=lambda r: r["site"])
+    totals = {key: sum(r[key] for r in site_reports) for key in ("found", "downloaded", "unchanged", "failed")}
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(time.monotonic() - started, 2),
+        "totals": totals,
+        "sites": site_reports,
+    }
+
+
+def print_report(report):
+    print("\n--- Scrape run report ---")
+    print(f"{'Site':<10} {'Found':>6} {'New':>6} {'Same':>6} {'Failed':>6} {'Secs':>7}  Error")
+    for r in report["sites"]:
+        print(f"{r['site']:<10} {r['found']:>6} {r['downloaded']:>6} {r['unchanged']:>6} {r['failed']:>6} "
+              f"{r.get('seconds', 0):>7}  {r['error'] or ''}")
+    t = report["totals"]
+    print(f"{'TOTAL':<10} {t['found']:>6} {t['downloaded']:>6} {t['unchanged']:>6} {t['failed']:>6} {report['seconds']:>7}")
+
+
+def save_report(report, report_dir=REPORT_DIR):
+    if not os.path.exists(report_dir):
+        os.makedirs(report_dir)
+    path = os.path.join(report_dir, f"scrape_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Run report saved to: {path}")
+    return path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape all investor-relations sites in parallel.")
+    parser.add_argument("--sites", nargs="+", choices=sorted(SITES), default=sorted(SITES),
+                        help="Sites to scrape (default: all)")
+    parser.add_argument("--workers", type=int, default=len(SITES), help="Worker processes")
+    parser.add_argument("--download-budget", type=int, default=DEFAULT_DOWNLOAD_BUDGET,
+                        help="Maximum downloads in flight across all sites")
+    parser.add_argument("--retries", type=int, default=download_manager.MAX_RETRIES)
+    parser.add_argument("--backoff", type=float, default=download_manager.BACKOFF_BASE,
+                        help="Initial retry backoff in seconds")
+    parser.add_argument("--rate", type=float, default=download_manager.RATE_PER_HOST,
+                        help="Requests per second per host")
+    parser.add_argument("--burst", type=int, default=download_manager.RATE_BURST,
+                        help="Token-bucket burst size per host")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Revalidate every known link, not just new or missing ones")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_all(args.sites, args.workers, args.download_budget,
+                     args.retries, args.backoff, args.rate, args.burst, refresh=args.refresh)
+    print_report(report)
+    save_report(report)
+    return 1 if report["totals"]["failed"] or any(r["error"] for r in report["sites"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
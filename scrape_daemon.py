@@ -0,0 +1,131 @@
+import time
+import argparse
+from datetime import date
+import schedule
+import scrape_all
+import summerize_earnings
+
+# --- Configuration ---
+# Per site: the company name used by summerize_earnings, the usual polling
+# interval, the tighter interval used around expected earnings releases, and
+# the (month, day) dates on which releases usually happen.
+COMPANY_SCHEDULES = {
+    "airbnb": {
+        "company": "AIRBNB", "interval_minutes": 360, "hot_interval_minutes": 10,
+        "earnings_dates": [(2, 13), (5, 1), (8, 6), (11, 5)],
+    },
+    "alphabet": {
+        "company": "ALPHABET", "interval_minutes": 360, "hot_interval_minutes": 10,
+        "earnings_dates": [(2, 4), (4, 24), (7, 23), (10, 29)],
+    },
+    "apple": {
+        "company": "APPLE", "interval_minutes": 360, "hot_interval_minutes": 10,
+        "earnings_dates": [(1, 30), (5, 1), (7, 31), (10, 30)],
+    },
+    "nvidia": {
+        "company": "NVIDIA", "interval_minutes": 360, "hot_interval_minutes": 10,
+        "earnings_dates": [(2, 26), (5, 28), (8, 27), (11, 19)],
+    },
+    # Tesla is scraped from a saved HTML page, so polling it often gains nothing.
+    "tesla": {
+        "company": "TESLA", "interval_minutes": 1440, "hot_interval_minutes": 1440,
+        "earnings_dates": [],
+    },
+}
+EARNINGS_WINDOW_DAYS = 2   # Poll at the hot interval from this many days before to after a release
+IDLE_SLEEP_SECONDS = 30
+REFRESH_INTERVAL_HOURS = 24   # How often a poll revalidates every known link, not just new ones
+
+_last_refresh = {}         # site -> time.monotonic() of its last refreshing poll
+
+
+def in_earnings_window(earnings_dates, today=None, window_days=EARNINGS_WINDOW_DAYS):
+    today = today or date.today()
+    for month, day in earnings_dates:
+        for year in (today.year - 1, today.year, today.year + 1):
+            try:
+                release = date(year, month, day)
+            except ValueError:
+                continue
+            if abs((release - today).days) <= window_days:
+                return True
+    return False
+
+
+def current_interval(site):
+    config = COMPANY_SCHEDULES[site]
+    if in_earnings_window(config["earnings_dates"]):
+        return config["hot_interval_minutes"]
+    return config["interval_minutes"]
+
+
+def refresh_due(site):
+    last = _last_refresh.get(site)
+    return last is None or time.monotonic() - last >= REFRESH_INTERVAL_HOURS * 3600
+
+
+def poll_site(site):
+    """
+    Scrapes one site and re-summarises its company only if new filings were downloaded.
+    Every REFRESH_INTERVAL_HOURS the poll also revalidates links it has already seen, so
+    filings replaced at the same URL are picked up too.
+    """
+    company = COMPANY_SCHEDULES[site]["company"]
+    refresh = refresh_due(site)
+    print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Polling {site}{' (refreshing known links)' if refresh else ''}...")
+    report = scrape_all.run_site(site, refresh=refresh)
+    if refresh and not report["error"]:
+        _last_refresh[site] = time.monotonic()
+    if report["error"]:
+        print(f"Polling {site} failed: {report['error']}")
+    elif report["downloaded"]:
+        print(f"{report['downloaded']} new or updated filings for {company}; refreshing its summary.")
+        try:
+            summerize_earnings.main(companies=[company])
+        except Exception as e:
+            print(f"Summarization for {company} failed: {e}")
+    else:
+        print(f"No new filings for {company}.")
+    return report
+
+
+def _poll_and_reschedule(site):
+    poll_site(site)
+    # The interval depends on the calendar, so every run schedules the next one afresh.
+    schedule_site(site)
+    return schedule.CancelJob
+
+
+def schedule_site(site):
+    minutes = current_interval(site)
+    schedule.every(minutes).minutes.do(_poll_and_reschedule, site).tag(site)
+    print(f"Next poll of {site} in {minutes} minutes.")
+
+
+def run(sites, poll_immediately=True):
+    for site in sites:
+        if poll_immediately:
+            schedule.every().second.do(_poll_and_reschedule, site).tag(site)
+        else:
+            schedule_site(site)
+    print(f"Scrape daemon started for: {', '.join(sites)}. Press Ctrl+C to stop.")
+    try:
+        while True:
+            schedule.run_pending()
+            idle = schedule.idle_seconds()
+            time.sleep(max(1, min(IDLE_SLEEP_SECONDS, idle if idle is not None else IDLE_SLEEP_SECONDS)))
+    except KeyboardInterrupt:
+        print("Scrape daemon stopped.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Poll investor pages and summarise new filings as they appear.")
+    parser.add_argument("--sites", nargs="+", choices=sorted(COMPANY_SCHEDULES), default=sorted(COMPANY_SCHEDULES))
+    parser.add_argument("--no-initial-poll", action="store_true",
+                        help="Wait for the first interval instead of polling every site at startup")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run(args.sites, poll_immediately=not args.no_initial_poll)
@@ -1,24 +1,47 @@
 import os
-import glob
-import re
-from PyPDF2 import PdfReader
+import json
+import hashlib
+import argparse
 # Quivr is not used in this core logic, can be removed if not needed elsewhere
 # from quivr_core import Brain 
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import yaml
-from collections import defaultdict
+from pdf_store import cached_sha256, file_sha256
+import pdf_catalog
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pdf_extraction import iter_pdf_pages, EXTRACTION_WORKERS
+from context_files import write_context_file, iter_context_pages
+import llm_cache
+import llm_gateway
+import table_extractor
 
 
 # --- Configuration ---
-CONTEXT_DIR = "contexts"
-OUTPUT_DIR = "summaries"
+# With LLM_BACKEND=stub everything is written to separate *_stub folders, so placeholder
+# output never replaces real summaries or their build manifest. CONTEXTS_DIR and
+# SUMMARIES_DIR override either folder.
+_DIR_SUFFIX = "_stub" if llm_gateway.BACKEND == "stub" else ""
+CONTEXT_DIR = os.environ.get("CONTEXTS_DIR", "contexts" + _DIR_SUFFIX)
+OUTPUT_DIR = os.environ.get("SUMMARIES_DIR", "summaries" + _DIR_SUFFIX)
 CONTEXT_OUTPUT_FILE_TEMPLATE = os.path.join(CONTEXT_DIR, "{company_name}_latest_context.txt")
 SUMMARY_OUTPUT_FILE_TEMPLATE = os.path.join(OUTPUT_DIR, "{company_name}_summary_latest_{year}.txt")
 TABLE_OUTPUT_FILE_TEMPLATE = os.path.join(OUTPUT_DIR, "{company_name}_{year}_table.txt")
 TARGET_START_YEAR = 2024
 TARGET_END_YEAR = 2030 
+GENERATION_CONFIG = {"candidate_count": 1, "max_output_tokens": 8192, "temperature": 0.5}
+SUMMARY_MODEL = "gemini-1.5-flash-latest"
+BUILD_MANIFEST_FILE = os.path.join(OUTPUT_DIR, ".build_manifest.json")
+# Bump when prompt handling changes in a way the template text below does not capture.
+PROMPT_TEMPLATE_VERSION = 1
 SETTINGS_FILE = "settings.yaml"
+# LLM fan-out limits; each can be overridden by the same key in lower case in settings.yaml.
+LLM_CONCURRENCY = 4            # Model calls in flight at once, across all companies
+LLM_REQUESTS_PER_MINUTE = 15   # Stay under the API's per-minute quota
+LLM_MAX_RETRIES = 5            # Retries for quota (429) and transient server errors
+LLM_TIMEOUT = 300              # Seconds per model call
+# Reports estimated above this many tokens are summarised chunk by chunk, then combined.
+MAP_REDUCE_THRESHOLD_TOKENS = 100000
+CHUNK_TOKENS = 25000           # Target size of each chunk sent to the map step
+CHARS_PER_TOKEN = 4            # Rough estimate, good enough for budgeting English text
 
 # List of input folders to search for PDFs
 INPUT_FOLDERS = [
@@ -198,63 +221,47 @@ if settings:
 if not GOOGLE_API_KEY or GOOGLE_API_KEY == "YOUR_GOOGLE_API_KEY":
     print(f"Warning: 'google_api_key' not found or is a placeholder in '{SETTINGS_FILE}'. Google AI calls will fail.")
 
-
-def get_pdf_files_from_folders(folders):
-    pdf_files = []
-    for folder in folders:
-        pdf_files.extend(glob.glob(os.path.join(folder, "**", "*.pdf"), recursive=True))
-    return pdf_files
-
-
-def extract_text_from_pdf(pdf_path):
-    print(f"Extracting text from: {pdf_path}")
-    try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page_num, page in enumerate(reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-            except Exception as e_page:
-                print(f"Error extracting text from page {page_num + 1} of {pdf_path}: {e_page}")
-                continue
-        return text
-    except Exception as e_file:
-        print(f"Error reading or processing PDF file {pdf_path}: {e_file}")
-        return ""
-
-
-def call_google_ai(prompt_text, task_description="task", model_name="gemini-1.5-flash-latest"):
-    if not GOOGLE_API_KEY or GOOGLE_API_KEY == "YOUR_GOOGLE_API_KEY":
+if settings:
+    LLM_CONCURRENCY = settings.get('llm_concurrency', LLM_CONCURRENCY)
+    LLM_REQUESTS_PER_MINUTE = settings.get('llm_requests_per_minute', LLM_REQUESTS_PER_MINUTE)
+    LLM_MAX_RETRIES = settings.get('llm_max_retries', LLM_MAX_RETRIES)
+    LLM_TIMEOUT = settings.get('llm_timeout', LLM_TIMEOUT)
+
+# The limits are shared by every thread that calls the model.
+llm_gateway.configure(api_key=GOOGLE_API_KEY, timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES,
+                      concurrency=LLM_CONCURRENCY, requests_per_minute=LLM_REQUESTS_PER_MINUTE)
+
+
+def call_google_ai(prompt_text, task_description="task", model_name=SUMMARY_MODEL, use_cache=True):
+    """Answers from the LLM response cache when possible; successful responses are stored there."""
+    # Offline stub answers must never be served as real ones later.
+    stub = llm_gateway.BACKEND == "stub"
+    if use_cache and not stub:
+        cached = llm_cache.get(model_name, GENERATION_CONFIG, prompt_text)
+        if cached is not None:
+            print(f"Using cached response for {task_description}.")
+            return cached
+
+    if not llm_gateway.is_available():
         msg = f"Error: GOOGLE_API_KEY is not properly set for {task_description}."
         print(msg)
         return msg
 
     print(f"Performing {task_description} with Google AI model: {model_name}...")
     try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel(model_name)
-        
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-        
-        generation_config = genai.types.GenerationConfig(
-            candidate_count=1, max_output_tokens=8192, temperature=0.5 
-        )
-        response = model.generate_content(
-            prompt_text, generation_config=generation_config, safety_settings=safety_settings
-        )
-        return response.text
-
+        response_text = llm_gateway.generate(prompt_text, model_name, GENERATION_CONFIG, task_description)
     except Exception as e:
         print(f"Error during Google AI {task_description}: {e}")
         return f"Error during {task_description}: {e}"
 
+    if stub:
+        return response_text
+    try:
+        llm_cache.put(model_name, GENERATION_CONFIG, prompt_text, response_text)
+    except OSError as e:
+        print(f"Warning: could not cache response for {task_description}: {e}")
+    return response_text
+
 
 # --- MODIFIED: This function now uses the PROMPT_CONFIG dictionary ---
 def generate_summary_with_google_ai(text_to_summarize, company_name):
@@ -274,118 +281,388 @@ def generate_summary_with_google_ai(text_to_summarize, company_name):
     return call_google_ai(final_prompt, f"Few-shot summary generation for {company_name}")
 
 
-def generate_yearly_table_with_google_ai(year, yearly_text):
-    if not yearly_text: return f"No content available for year {year} to create a table."
-    prompt = (
-        f"From the following financial text for the year {year}, extract key data points and present them in a Markdown table. The table should have two columns: 'Metric' and 'Value'. "
-        f"Include items like: Revenue, Net Income, EPS, Gross Margin, Operating Income, etc. Ensure the output is only the Markdown table.\n\n"
-        f"Text for {year}:\n{yearly_text}"
-    )
-    return call_google_ai(prompt, f"Markdown table generation for {year}")
+CHUNK_SUMMARY_PROMPT_TEMPLATE = (
+    "You are a financial analyst. Below is part {part} of {parts} of {company_name}'s latest earnings report. "
+    "Write detailed notes on this part only: keep every figure (revenue, EPS, margins, segment results, "
+    "year-over-year changes), all forward-looking guidance, and notable management commentary. "
+    "Do not speculate about parts you cannot see.\n\n"
+    "--- REPORT PART {part} OF {parts} ---\n{chunk_text}\n--- END REPORT PART ---"
+)
 
 
-def group_pdfs_by_company_and_year(pdf_files, start_year, end_year):
-    """Group PDFs by company (parent folder) and year."""
-    grouped = defaultdict(lambda: defaultdict(list))
-    year_regex = re.compile(r'(19|20)\d{2}|FY(\d{2})|F[1-4]Q(\d{2})|Q(\d{2})')
-    for pdf_path in pdf_files:
-        try:
-            company = os.path.basename(os.path.dirname(pdf_path)).replace('pdf_downloads_', '').upper()
-            filename = os.path.basename(pdf_path)
-            match = year_regex.search(filename)
-            year = None
-            if match:
-                if match.group(1): year = int(match.group(0))
-                elif match.group(2): year = int('20' + match.group(2))
-                elif match.group(3): year = int('20' + match.group(3))
-                elif match.group(4): year = int('20' + match.group(4))
-            
-            if company and year and start_year <= year <= end_year:
-                grouped[company][year].append(pdf_path)
-        except Exception as e:
-            print(f"Could not process path {pdf_path}: {e}")
-
-    for company in grouped:
-        for year in grouped[company]:
-            grouped[company][year].sort()
-            
-    return grouped
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
 
 
-def ensure_dir(directory):
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+def split_into_chunks(pages, max_tokens=None):
+    """
+    Groups page texts into chunks of at most max_tokens (estimated), never splitting
+    a page unless it is too big on its own, in which case it is split between lines.
+    """
+    max_chars = (max_tokens or CHUNK_TOKENS) * CHARS_PER_TOKEN
+    pieces = []
+    for page_text in pages:
+        if len(page_text) <= max_chars:
+            pieces.append(page_text)
+            continue
+        lines = page_text.splitlines(keepends=True)
+        current = ""
+        for line in lines:
+            while len(line) > max_chars:  # A single enormous line: fall back to a hard cut
+                pieces.append(current + line[:max_chars - len(current)])
+                line, current = line[max_chars - len(current):], ""
+            if len(current) + len(line) > max_chars:
+                pieces.append(current)
+                current = ""
+            current += line
+        if current:
+            pieces.append(current)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def generate_summary_map_reduce(pages, company_name):
+    """
+    Summarises a report too long for one prompt: every chunk gets its own notes call
+    (in parallel, within the shared LLM limits), then the company's few-shot prompt
+    turns the combined notes into the final summary.
+    """
+    chunks = split_into_chunks(pages)
+    print(f"Summarising {company_name} in {len(chunks)} chunks (map-reduce).")
+    prompts = [
+        CHUNK_SUMMARY_PROMPT_TEMPLATE.format(part=i + 1, parts=len(chunks), company_name=company_name, chunk_text=chunk)
+        for i, chunk in enumerate(chunks)
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, min(LLM_CONCURRENCY, len(prompts)))) as calls:
+        notes = list(calls.map(
+            lambda i: call_google_ai(prompts[i], f"Chunk {i + 1}/{len(prompts)} notes for {company_name}"),
+            range(len(prompts))))
+
+    failed = [note for note in notes if _is_llm_error(note)]
+    if failed:
+        return failed[0]
+    combined = "\n\n".join(f"[Part {i + 1} of {len(notes)}]\n{note}" for i, note in enumerate(notes))
+    return generate_summary_with_google_ai(combined, company_name)
+
+
+def summarize_report(full_text, company_name, context_filename=None):
+    """
+    Single-prompt summary for normal reports, map-reduce above MAP_REDUCE_THRESHOLD_TOKENS.
+    The map step streams the pages from context_filename instead of keeping a second
+    copy of the report; without one the text is chunked as a single page.
+    """
+    if estimate_tokens(full_text) > MAP_REDUCE_THRESHOLD_TOKENS:
+        pages = ((page_text for _, page_text in iter_context_pages(context_filename))
+                 if context_filename else [full_text])
+        return generate_summary_map_reduce(pages, company_name)
+    return generate_summary_with_google_ai(full_text, company_name)
 
 
-def main():
-    print("Starting earnings report processing...")
-    ensure_dir(OUTPUT_DIR)
-    ensure_dir(CONTEXT_DIR) 
-    for folder in INPUT_FOLDERS:
-        ensure_dir(folder)
+TABLE_PROMPT_TEMPLATE = (
+    "From the following financial text for the year {year}, extract key data points and present them in a Markdown table. The table should have two columns: 'Metric' and 'Value'. "
+    "Include items like: Revenue, Net Income, EPS, Gross Margin, Operating Income, etc. Ensure the output is only the Markdown table.\n\n"
+    "Text for {year}:\n{yearly_text}"
+)
 
-    all_pdf_files = get_pdf_files_from_folders(INPUT_FOLDERS)
-    if not all_pdf_files:
-        print(f"No PDF files found in input folders: {INPUT_FOLDERS}.")
-        return
 
-    grouped = group_pdfs_by_company_and_year(all_pdf_files, TARGET_START_YEAR, TARGET_END_YEAR)
-    if not grouped:
-        print(f"No PDF files found matching the year range {TARGET_START_YEAR}-{TARGET_END_YEAR}.")
-        return
+def generate_yearly_table_with_google_ai(year, yearly_text):
+    if not yearly_text: return f"No content available for year {year} to create a table."
+    prompt = TABLE_PROMPT_TEMPLATE.format(year=year, yearly_text=yearly_text)
+    return call_google_ai(prompt, f"Markdown table generation for {year}")
 
-    for company, years_dict in grouped.items():
-        print(f"\n--- Processing company: {company} ---")
 
-        if not years_dict:
-            print(f"No reports found for {company} in the specified year range.")
-            continue
+TABLE_FALLBACK_PROMPT_TEMPLATE = (
+    "From the following financial text for the year {year}, find only these metrics: {metrics}. "
+    "Present them in a Markdown table with two columns: 'Metric' and 'Value', using the metric names exactly as given "
+    "and writing each value with its unit (e.g. '$1.2 billion'). "
+    "Leave out any metric the text does not report. Ensure the output is only the Markdown table.\n\n"
+    "Text for {year}:\n{yearly_text}"
+)
 
-        latest_year = max(years_dict.keys())
-        newest_pdf_path = years_dict[latest_year][-1]
-        
-        print(f"Identified newest report: {os.path.basename(newest_pdf_path)}")
 
-        full_report_text = extract_text_from_pdf(newest_pdf_path)
+def generate_yearly_table(year, yearly_text, company):
+    """
+    Builds the metrics table with the rule-based table_extractor, which is instant and
+    reproducible. Only metrics it cannot find are asked of the LLM; if it finds nothing
+    at all the whole table comes from the LLM as before. Returns (table, complete):
+    complete is False when the LLM part failed, so the table is written but not recorded
+    as built and the next run tries again.
+    """
+    if not yearly_text: return f"No content available for year {year} to create a table.", False
+    rows, missing = table_extractor.extract_metrics(yearly_text, company)
+    if not rows:
+        print(f"No metrics found by the table extractor for {company}; using the LLM for the whole table.")
+        table = generate_yearly_table_with_google_ai(year, yearly_text)
+        return table, not _is_llm_error(table)
+    print(f"Table extractor found {len(rows)} metrics for {company}; missing: {', '.join(missing) or 'none'}.")
+
+    complete = True
+    if missing:
+        prompt = TABLE_FALLBACK_PROMPT_TEMPLATE.format(year=year, metrics=", ".join(missing), yearly_text=yearly_text)
+        response = call_google_ai(prompt, f"Missing table metrics for {company} {year}")
+        if _is_llm_error(response):
+            # The extracted rows are still worth showing, but the table is retried next run.
+            print(f"Keeping the extracted table for {company} without: {', '.join(missing)}.")
+            complete = False
+        else:
+            wanted = {name.lower() for name in missing}
+            # The model writes its own units into the value ("$1.2 billion").
+            rows += [(metric, value, "", "LLM") for metric, value in table_extractor.parse_table_rows(response)
+                     if metric.lower() in wanted]
+    return table_extractor.format_table(rows), complete
 
-        if not full_report_text.strip():
-            print(f"No text could be extracted from {newest_pdf_path}. Skipping {company}.")
-            continue
 
-        context_filename = CONTEXT_OUTPUT_FILE_TEMPLATE.format(company_name=company)
-        try:
-            with open(context_filename, "w", encoding="utf-8") as f:
-                f.write(full_report_text)
-            print(f"Full text context saved to: {context_filename}")
-        except IOError as e:
-            print(f"Error saving context file for {company}: {e}")
+def ensure_dir(directory):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
 
-        # --- MODIFIED: Pass the company name to the summary generator ---
-        print(f"Generating style-matched summary for {company}...")
-        summary_content = generate_summary_with_google_ai(full_report_text, company)
-        
+def load_build_manifest():
+    try:
+        with open(BUILD_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable build manifest {BUILD_MANIFEST_FILE}: {e}")
+        return {}
+
+
+def save_build_manifest(manifest):
+    tmp_path = BUILD_MANIFEST_FILE + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, BUILD_MANIFEST_FILE)
+
+
+def prompt_version(company):
+    """Fingerprint of everything that shapes this company's prompts."""
+    template = PROMPT_CONFIG.get(company.upper(), PROMPT_CONFIG['DEFAULT'])
+    material = (f"{PROMPT_TEMPLATE_VERSION}\n{template}\n{TABLE_PROMPT_TEMPLATE}\n{CHUNK_SUMMARY_PROMPT_TEMPLATE}\n"
+                f"{TABLE_FALLBACK_PROMPT_TEMPLATE}\ntable-extractor-{table_extractor.EXTRACTOR_VERSION}\n"
+                f"{MAP_REDUCE_THRESHOLD_TOKENS}/{CHUNK_TOKENS}/{CHARS_PER_TOKEN}")
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+def build_inputs(company, pdf_path, pdf_sha256=None):
+    return {
+        "pdf": pdf_path,
+        "pdf_sha256": pdf_sha256 or cached_sha256(pdf_path),
+        "prompt_version": prompt_version(company),
+        "model": SUMMARY_MODEL,
+        "backend": llm_gateway.BACKEND,
+        "generation_config": GENERATION_CONFIG,
+    }
+
+
+def output_paths(company, year):
+    return {
+        "context": CONTEXT_OUTPUT_FILE_TEMPLATE.format(company_name=company),
+        "summary": SUMMARY_OUTPUT_FILE_TEMPLATE.format(company_name=company, year=year),
+        "table": TABLE_OUTPUT_FILE_TEMPLATE.format(company_name=company, year=year),
+    }
+
+
+def stale_outputs(entry, inputs, paths, force=False):
+    """
+    Returns the outputs ('context', 'summary', 'table') that must be rebuilt: all of
+    them when forced or never built, the context when the PDF changed, the LLM outputs
+    when any input changed, and any output that is missing or was edited since.
+    """
+    if force or not entry:
+        return set(paths)
+    stale = set()
+    previous = entry.get("inputs", {})
+    if previous.get("pdf_sha256") != inputs["pdf_sha256"]:
+        stale.update(paths)
+    elif previous != inputs:
+        stale.update(("summary", "table"))
+    recorded = entry.get("outputs", {})
+    for name, path in paths.items():
+        if name not in recorded or not os.path.exists(path) or file_sha256(path) != recorded[name]:
+            stale.add(name)
+    return stale
+
+
+def _is_llm_error(content):
+    return content.startswith(("Error", "No content available"))
+
+
+def extract_context(company, pdf_path, executor=None):
+    """
+    Streams the pages of a report straight into contexts/<COMPANY>_latest_context.txt
+    (plus its page offsets). Returns the context file name, or None if nothing was extracted.
+    """
+    print(f"Extracting text from: {pdf_path}")
+    context_filename = CONTEXT_OUTPUT_FILE_TEMPLATE.format(company_name=company)
+    try:
+        pages_written = write_context_file(iter_pdf_pages(pdf_path, executor=executor), context_filename)
+    except Exception as e:
+        print(f"Error extracting {pdf_path} into context file for {company}: {e}")
+        return None
+    if not pages_written:
+        print(f"No text could be extracted from {pdf_path}. Skipping {company}.")
+        return None
+    print(f"Full text context saved to: {context_filename} ({pages_written} pages)")
+    return context_filename
+
+
+def process_company(company, latest_year, newest_pdf_path, context_filename, outputs=("summary", "table")):
+    """
+    Writes the requested outputs ('summary', 'table') for one company's newest report
+    from its context file. Returns {output: sha256} for the outputs written successfully.
+    """
+    print(f"\n--- Processing company: {company} ---")
+    print(f"Identified newest report: {os.path.basename(newest_pdf_path)}")
+
+    full_report_text = "".join(page_text for _, page_text in iter_context_pages(context_filename))
+    written = {}
+
+    # The summary and table are independent calls, so they run side by side.
+    with ThreadPoolExecutor(max_workers=2) as calls:
+        if "summary" in outputs:
+            # --- MODIFIED: Pass the company name to the summary generator ---
+            print(f"Generating style-matched summary for {company}...")
+            summary_future = calls.submit(summarize_report, full_report_text, company, context_filename)
+        if "table" in outputs:
+            print(f"Generating data table for {company}...")
+            table_future = calls.submit(generate_yearly_table, latest_year, full_report_text, company)
+
+    if "summary" in outputs:
+        summary_content = summary_future.result()
         summary_filename = SUMMARY_OUTPUT_FILE_TEMPLATE.format(company_name=company, year=latest_year)
         try:
             with open(summary_filename, "w", encoding="utf-8") as f:
                 f.write(summary_content)
             print(f"Display summary saved to: {summary_filename}")
+            if not _is_llm_error(summary_content):
+                written["summary"] = file_sha256(summary_filename)
         except IOError as e:
             print(f"Error saving summary file: {e}")
 
-        print(f"Generating data table for {company}...")
-        table_content = generate_yearly_table_with_google_ai(latest_year, full_report_text)
+    if "table" in outputs:
+        table_content, table_complete = table_future.result()
         table_filename = TABLE_OUTPUT_FILE_TEMPLATE.format(company_name=company, year=latest_year)
         try:
             with open(table_filename, "w", encoding="utf-8") as f:
                 f.write(table_content)
             print(f"Data table saved to: {table_filename}")
+            if table_complete:
+                written["table"] = file_sha256(table_filename)
         except IOError as e:
             print(f"Error saving table file: {e}")
 
+    return written
+
+
+def main(companies=None, force=False):
+    """
+    Processes every company in INPUT_FOLDERS, or only the given company names (e.g. ["NVIDIA"]).
+    Companies whose newest report, prompts and model are unchanged since the last build
+    (see BUILD_MANIFEST_FILE) are skipped unless force is set; otherwise only their
+    stale outputs are rebuilt.
+    """
+    print("Starting earnings report processing...")
+    ensure_dir(OUTPUT_DIR)
+    ensure_dir(CONTEXT_DIR) 
+    for folder in INPUT_FOLDERS:
+        ensure_dir(folder)
+
+    folders = INPUT_FOLDERS
+    if companies:
+        wanted = {c.upper() for c in companies}
+        folders = [f for f in INPUT_FOLDERS if f.replace('pdf_downloads_', '').upper() in wanted]
+
+    # The catalog stats every PDF but only re-hashes files whose size or mtime changed since the last run.
+    conn = pdf_catalog.connect()
+    try:
+        counts = pdf_catalog.scan(folders, conn)
+        print(f"PDF catalog: {counts['added']} added, {counts['updated']} updated, {counts['removed']} removed; "
+              f"{counts['blobs_removed']} unused blobs deleted from the PDF store.")
+        latest = pdf_catalog.latest_reports(conn, companies=[pdf_catalog.company_from_folder(f) for f in folders],
+                                            start_year=TARGET_START_YEAR, end_year=TARGET_END_YEAR)
+    finally:
+        conn.close()
+    if not latest:
+        print(f"No PDF files found in {folders} for the year range {TARGET_START_YEAR}-{TARGET_END_YEAR}.")
+        return
+
+    newest = {company: (row["fiscal_year"], row["path"]) for company, row in latest.items()}
+    for company in sorted({pdf_catalog.company_from_folder(f) for f in folders} - set(newest)):
+        print(f"No reports found for {company} in the specified year range.")
+
+    manifest = load_build_manifest()
+    plans = {}
+    for company, (latest_year, newest_pdf_path) in newest.items():
+        inputs = build_inputs(company, newest_pdf_path, latest[company]["sha256"])
+        paths = output_paths(company, latest_year)
+        stale = stale_outputs(manifest.get(company), inputs, paths, force)
+        if not stale:
+            print(f"{company}: up to date ({os.path.basename(newest_pdf_path)}), skipping.")
+            continue
+        plans[company] = (inputs, paths, stale)
+
+    # Extract every stale context at once: the PDFs share one process pool,
+    # and each is streamed page by page into its context file.
+    to_extract = [company for company, (_, _, stale) in plans.items() if "context" in stale]
+    with ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS) as executor:
+        with ThreadPoolExecutor(max_workers=max(1, len(to_extract))) as streams:
+            contexts = dict(zip(to_extract, streams.map(
+                lambda company: extract_context(company, newest[company][1], executor), to_extract)))
+
+    # Companies run concurrently; the concurrency and requests-per-minute limits set on
+    # llm_gateway keep the total request rate within quota however many are in flight.
+    with ThreadPoolExecutor(max_workers=max(1, min(LLM_CONCURRENCY, len(plans)))) as pool:
+        futures = {}
+        for company, (inputs, paths, stale) in plans.items():
+            latest_year, newest_pdf_path = newest[company]
+            context_filename = contexts[company] if "context" in stale else paths["context"]
+            if not context_filename:
+                continue
+            future = pool.submit(process_company, company, latest_year, newest_pdf_path, context_filename,
+                                 outputs=[name for name in ("summary", "table") if name in stale])
+            futures[future] = (company, inputs, stale, context_filename)
+
+        # The manifest is only touched from this thread.
+        for future in as_completed(futures):
+            company, inputs, stale, context_filename = futures[future]
+            try:
+                written = future.result()
+            except Exception as e:
+                print(f"Processing {company} failed: {e}")
+                continue
+            # Outputs that were not rebuilt keep their recorded hashes.
+            entry = manifest.get(company) or {}
+            outputs = {name: sha256 for name, sha256 in entry.get("outputs", {}).items() if name not in stale}
+            if "context" in stale:
+                outputs["context"] = file_sha256(context_filename)
+            outputs.update(written)
+            manifest[company] = {"inputs": inputs, "outputs": outputs}
+            save_build_manifest(manifest)
+
+    print(llm_cache.format_stats())
+    print(llm_gateway.format_metrics())
     print("\nProcess completed.")
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract, summarise and tabulate the newest earnings reports.")
+    parser.add_argument("--force", action="store_true", help="Rebuild every output even if its inputs are unchanged")
+    parser.add_argument("--companies", nargs="+", help="Only process these companies (e.g. NVIDIA APPLE)")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(companies=args.companies, force=args.force)
 
 #check this is the final version 
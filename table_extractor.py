@@ -0,0 +1,178 @@
+import re
+
+# --- Configuration ---
+# Bump whenever the extraction rules change so cached/built tables are regenerated.
+EXTRACTOR_VERSION = 2
+HEADER_LOOKBACK_CHARS = 4000   # How far above a row to look for its column headers
+SCALE_LOOKBACK_CHARS = 8000    # How far above a row to look for its statement's "(in millions)"
+
+# Metric name -> label pattern. A label only counts at the start of a line (or after
+# the double spaces that separate cells in flattened tables) and must be followed
+# directly by its figures, so prose like "net income grew to..." never matches.
+METRICS = [
+    ("Revenue", r"(?:Total\s+)?(?:net\s+)?(?:revenues?|net\s+sales)"),
+    ("Gross margin", r"Gross\s+margin"),
+    ("Operating income", r"(?:Operating\s+income|Income\s+from\s+operations)"),
+    ("Net income", r"Net\s+income"),
+    ("Diluted EPS", r"Diluted(?:\s+(?:net\s+income|earnings)\s+per\s+share|\s+EPS)?"),
+]
+# Per-share figures are never scaled, whatever the statement header says.
+PER_SHARE_METRICS = {"Diluted EPS"}
+
+# Segment revenue rows are named differently by every company.
+SEGMENT_LABELS = {
+    "AIRBNB": [],
+    "ALPHABET": ["Google Services total", "Google Cloud", "Other Bets"],
+    "APPLE": ["iPhone", "Mac", "iPad", "Wearables, Home and Accessories", "Services",
+              "Americas", "Europe", "Greater China", "Japan", "Rest of Asia Pacific"],
+    "NVIDIA": ["Compute & Networking", "Graphics", "Data Center", "Gaming",
+               "Professional Visualization", "Automotive"],
+    "TESLA": ["Total automotive revenues", "Energy generation and storage revenue",
+              "Services and other revenue"],
+}
+
+_LABEL_START = r"(?:^|(?<=\n)|(?<=\s\s))"
+# Footnote markers and notes between a label and its figures: "*", "(1)", "( Note 12 )", "(loss)"
+_LABEL_SUFFIX = r"\*?(?:[ \t]*\([^)\n]{1,20}\))?[ \t]*:?"
+_VALUE = re.compile(
+    r"(?P<open>\()?[ \t]?(?P<currency>\$)?[ \t]?(?P<open2>\()?"
+    r"(?P<number>\d[\d,]*(?:\.\d+)?)\)?(?P<unit>[ \t]?%|[MBK]\b)?"
+)
+_MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+           "august", "september", "october", "november", "december"]
+_HEADERS = [
+    # Q1 FY26 Q4 FY25 Q1 FY25
+    re.compile(r"(?:Q[1-4][ \t]*FY[ \t]*\d{2,4}[ \t]*){2,}"),
+    # March 29, 2025  March 30, 2024
+    re.compile(r"(?:(?:" + "|".join(_MONTHS) + r")[ \t]+\d{1,2},[ \t]*\d{4}[ \t]*){2,}", re.IGNORECASE),
+    # 2024 2025 on a line of its own
+    re.compile(r"^[ \t]*(?:20\d{2}[ \t]+)+20\d{2}[ \t]*$", re.MULTILINE),
+]
+# (in millions), ($ in millions, except per share data), (In thousands; unaudited)
+_SCALE = re.compile(r"\([ \t]*(?:\$[ \t]*)?in[ \t]+(thousands|millions|billions)\b", re.IGNORECASE)
+_PERIOD = re.compile(
+    r"Q(?P<quarter>[1-4])[ \t]*FY[ \t]*(?P<fy>\d{2,4})"
+    r"|(?P<month>" + "|".join(_MONTHS) + r")[ \t]+(?P<day>\d{1,2}),[ \t]*(?P<date_year>\d{4})"
+    r"|(?P<year>20\d{2})",
+    re.IGNORECASE,
+)
+
+
+def _period_key(match):
+    if match.group("quarter"):
+        fy = int(match.group("fy"))
+        return (fy + 2000 if fy < 100 else fy, int(match.group("quarter")), 0)
+    if match.group("month"):
+        month = _MONTHS.index(match.group("month").lower()) + 1
+        return (int(match.group("date_year")), month, int(match.group("day")))
+    return (int(match.group("year")), 0, 0)
+
+
+def _parse_values(text, pos):
+    """Reads consecutive figures starting at pos; stops at the first one of a different kind (e.g. a % after $)."""
+    values = []
+    kind = None
+    while True:
+        gap = re.match(r"[ \t]*", text[pos:])
+        match = _VALUE.match(text, pos + gap.end())
+        if not match or (values and not gap.end()):
+            break
+        value_kind = "%" if match.group("unit") and "%" in match.group("unit") else "amount"
+        if kind and value_kind != kind:
+            break
+        kind = value_kind
+        number = match.group("number")
+        unit = (match.group("unit") or "").strip()
+        value = f"{'$' if match.group('currency') else ''}{number}{unit}"
+        if match.group("open") or match.group("open2"):
+            value = f"({value})"
+        values.append(value)
+        pos = match.end()
+    return values
+
+
+def _find_header(text, pos):
+    """Returns [(label, key), ...] for the nearest column header above pos, or None."""
+    window_start = max(0, pos - HEADER_LOOKBACK_CHARS)
+    window = text[window_start:pos]
+    best = None
+    for pattern in _HEADERS:
+        for match in pattern.finditer(window):
+            if best is None or match.end() > best.end():
+                best = match
+    if best is None:
+        return None
+    return [(" ".join(p.group(0).split()), _period_key(p)) for p in _PERIOD.finditer(best.group(0))]
+
+
+def _find_scale(text, pos):
+    """Returns 'thousands', 'millions' or 'billions' from the nearest scale note above pos, or None."""
+    scales = _SCALE.findall(text, max(0, pos - SCALE_LOOKBACK_CHARS), pos)
+    return scales[-1].lower() if scales else None
+
+
+def _find_row(text, label_pattern):
+    """
+    Returns (value, period, scale) for the first row labelled label_pattern whose figures
+    line up with a column header; the value is taken from the most recent period and
+    scale is the unit its statement is reported in (None if the text does not say).
+    """
+    pattern = re.compile(_LABEL_START + r"(?:" + label_pattern + r")" + _LABEL_SUFFIX + r"(?=[ \t]*[($\d])",
+                         re.IGNORECASE)
+    for match in pattern.finditer(text):
+        values = _parse_values(text, match.end())
+        header = _find_header(text, match.start())
+        if not values or not header or len(values) != len(header):
+            continue
+        latest = max(range(len(header)), key=lambda i: (header[i][1], -i))
+        return values[latest], header[latest][0], _find_scale(text, match.start())
+    return None
+
+
+def extract_metrics(text, company=None):
+    """
+    Pulls the standard metrics (and the company's segment revenue) out of report text
+    without calling a model. Returns (rows, missing): rows are (metric, value, unit, period)
+    in METRICS order, missing lists the metric names that could not be found. unit is
+    the statement's scale ("millions"), "per share", or empty for percentages and
+    figures whose scale the text does not give.
+    """
+    rows = []
+    missing = []
+    labels = [(name, pattern) for name, pattern in METRICS]
+    for segment in SEGMENT_LABELS.get((company or "").upper(), []):
+        labels.append((f"Segment revenue: {segment}", re.escape(segment).replace(r"\ ", r"\s+")))
+    for name, pattern in labels:
+        found = _find_row(text, pattern)
+        if found:
+            value, period, scale = found
+            if name in PER_SHARE_METRICS:
+                unit = "per share"
+            elif value.rstrip(")").endswith(("%", "M", "B", "K")):
+                unit = ""   # Percentages and figures that carry their own unit
+            else:
+                unit = scale or ""
+            rows.append((name, value, unit, period))
+        else:
+            missing.append(name)
+    return rows, missing
+
+
+def format_table(rows):
+    """Markdown table with 'Metric', 'Value', 'Unit' and 'Period' columns."""
+    lines = ["| Metric | Value | Unit | Period |", "|---|---|---|---|"]
+    lines += [f"| {metric} | {value} | {unit} | {period} |" for metric, value, unit, period in rows]
+    return "\n".join(lines) + "\n"
+
+
+def parse_table_rows(markdown):
+    """Reads (metric, value) pairs back out of a two-column Markdown table, skipping its header."""
+    rows = []
+    for line in markdown.splitlines():
+        cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+        if len(cells) < 2 or not line.strip().startswith("|"):
+            continue
+        if set(cells[0]) <= set("-: ") or cells[0].lower() == "metric":
+            continue
+        rows.append((cells[0], cells[1]))
+    return rows
@@ -1,20 +1,36 @@
 import os
-import glob
+import json
+import fnmatch
 import yaml
 import re
-from flask import Flask, render_template_string, url_for, render_template, request, jsonify
+import threading
+import functools
+from collections import OrderedDict
+from flask import Flask, render_template_string, url_for, render_template, request, jsonify, Response, stream_with_context
 from jinja2 import DictLoader
 import markdown
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import llm_gateway
+import context_index
 
 app = Flask(__name__)
 
 # --- Configuration ---
 SETTINGS_FILE = "settings.yaml"
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
-# --- NEW --- Directory where full-text contexts are stored
-CONTEXT_DIR = "contexts" 
+# Directories written by summerize_earnings.py; like there, LLM_BACKEND=stub uses the
+# *_stub folders and CONTEXTS_DIR / SUMMARIES_DIR override them.
+_DIR_SUFFIX = "_stub" if llm_gateway.BACKEND == "stub" else ""
+CONTEXT_DIR = os.environ.get("CONTEXTS_DIR", "contexts" + _DIR_SUFFIX)
+# Using 1.5 Pro because it has a very large context window, perfect for full reports
+CHAT_MODEL = "gemini-1.5-pro-latest"
+# Contexts shorter than this are sent whole; longer ones are narrowed to the best passages.
+RETRIEVAL_MIN_CONTEXT_CHARS = 16000
+RETRIEVAL_TOP_K = 6
+# Decoded contexts (and their chunk indexes) kept in memory across requests
+CONTEXT_CACHE_MAX_ENTRIES = 16
+CONTEXT_CACHE_MAX_BYTES = 64 * 1024 * 1024   # Measured as the context files' size on disk
+RENDER_CACHE_SIZE = 128    # Rendered summary/table pages kept in memory
+SUMMARIES_DIR = os.path.join(PROJECT_ROOT, os.environ.get("SUMMARIES_DIR", "summaries" + _DIR_SUFFIX))
 
 def load_settings():
     """Loads settings from a YAML file."""
@@ -28,29 +44,104 @@ def load_settings():
 settings = load_settings()
 GOOGLE_API_KEY = settings.get('google_api_key')
 
-if not GOOGLE_API_KEY or GOOGLE_API_KEY == "YOUR_GOOGLE_API_KEY":
+llm_gateway.configure(api_key=GOOGLE_API_KEY, timeout=settings.get('llm_timeout'),
+                      max_retries=settings.get('llm_max_retries'))
+
+if not llm_gateway.is_available():
     print("WARNING: 'google_api_key' not found or is a placeholder in settings.yaml. The chat feature will not work.")
 
 
+class ContextCache:
+    """
+    Thread-safe LRU of decoded context files, keyed by company, together with artifacts
+    derived from them (the chunk index). Every lookup costs one os.stat: an entry whose
+    file size or mtime changed is reloaded, and the least recently used entries are
+    dropped beyond max_entries or max_bytes.
+    """
+
+    def __init__(self, context_dir, max_entries=CONTEXT_CACHE_MAX_ENTRIES, max_bytes=CONTEXT_CACHE_MAX_BYTES):
+        self.context_dir = context_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0}
+
+    def path(self, company):
+        return os.path.join(self.context_dir, f"{company}_latest_context.txt")
+
+    def exists(self, company):
+        return self._signature(self.path(company)) is not None
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, company):
+        """Returns the cache entry ({'path', 'text', 'index', ...}); raises FileNotFoundError if there is no context."""
+        path = self.path(company)
+        signature = self._signature(path)
+        with self._lock:
+            entry = self._entries.get(company)
+            if signature is None:
+                if entry:
+                    self._drop(company)
+                raise FileNotFoundError(path)
+            if entry and entry["signature"] == signature:
+                self._entries.move_to_end(company)
+                self.stats["hits"] += 1
+                return entry
+            self.stats["reloads" if entry else "misses"] += 1
+        # Read outside the lock so one slow load does not stall requests for other companies.
+        # The entry's signature comes from the open file, so it always describes this text.
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            data = f.read()
+        entry = {"path": path, "signature": (stat.st_size, stat.st_mtime_ns), "stat": stat,
+                 "text": data.decode("utf-8"), "size": len(data), "index": None}
+        with self._lock:
+            if company in self._entries:
+                self._drop(company)
+            self._entries[company] = entry
+            self._bytes += entry["size"]
+            while len(self._entries) > self.max_entries or (self._bytes > self.max_bytes and len(self._entries) > 1):
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+        return entry
+
+    def _drop(self, company):
+        self._bytes -= self._entries.pop(company)["size"]
+
+    @staticmethod
+    def chunk_index(entry):
+        """The entry's chunk index, loaded (or built from the entry's own text) once per version of the file."""
+        if entry["index"] is None:
+            # Two racing requests may both build it; both results are identical.
+            entry["index"] = context_index.ChunkIndex.for_context(entry["path"], entry["text"], entry["stat"])
+        return entry["index"]
+
+    def snapshot_stats(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["reloads"]
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes,
+                        hit_rate=(self.stats["hits"] / lookups) if lookups else 0.0)
+
+
+context_cache = ContextCache(os.path.join(PROJECT_ROOT, CONTEXT_DIR))
+
+
 def call_google_ai(prompt_text, task_description="chat response"):
     """Calls the Google Gemini API with a specific prompt."""
-    if not GOOGLE_API_KEY or GOOGLE_API_KEY == "YOUR_GOOGLE_API_KEY":
+    if not llm_gateway.is_available():
         return "Error: The GOOGLE_API_KEY is not configured on the server."
 
     try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        # Using 1.5 Pro because it has a very large context window, perfect for full reports
-        model = genai.GenerativeModel("gemini-1.5-pro-latest")
-        
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-        
-        response = model.generate_content(prompt_text, safety_settings=safety_settings)
-        return response.text
+        return llm_gateway.generate(prompt_text, CHAT_MODEL, task_description=task_description)
     except Exception as e:
         print(f"Error during Google AI call: {e}")
         return f"An error occurred while contacting the AI model: {e}"
@@ -192,17 +283,40 @@ HTML_CHAT_PAGE = """
                 sendBtn.innerText = '...';
 
                 try {
-                    const response = await fetch('/api/ask', {
+                    // The answer is streamed as Server-Sent Events and shown as it arrives.
+                    const response = await fetch('/api/ask/stream', {
                         method: 'POST',
                         headers: { 'Content-Type': 'application/json' },
                         // MODIFIED: Sending company_name instead of a filename
                         body: JSON.stringify({ question: question, company_name: companyName })
                     });
                     if (!response.ok) throw new Error(`Server error: ${response.statusText}`);
-                    const data = await response.json();
-                    // Using markdown-it in the future would be better, but for now, simple replace.
-                    const formattedAnswer = data.answer.replace(/\\n/g, '<br>');
-                    appendMessage(formattedAnswer, 'bot', true);
+                    const botMessage = appendMessage('', 'bot');
+                    botMessage.style.whiteSpace = 'pre-wrap';
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffer = '';
+                    let finished = false;
+                    while (!finished) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffer += decoder.decode(value, { stream: true });
+                        const events = buffer.split('\\n\\n');
+                        buffer = events.pop();
+                        for (const block of events) {
+                            let eventName = 'message';
+                            let data = '';
+                            for (const line of block.split('\\n')) {
+                                if (line.startsWith('event: ')) eventName = line.slice(7);
+                                else if (line.startsWith('data: ')) data += line.slice(6);
+                            }
+                            const payload = data ? JSON.parse(data) : {};
+                            if (eventName === 'error') throw new Error(payload.error);
+                            if (eventName === 'done') { finished = true; break; }
+                            botMessage.textContent += payload.text;
+                            chatBox.scrollTop = chatBox.scrollHeight;
+                        }
+                    }
                 } catch (error) {
                     appendMessage(`Error: ${error.message}`, 'error');
                 } finally {
@@ -221,6 +335,7 @@ HTML_CHAT_PAGE = """
                 }
                 chatBox.appendChild(messageDiv);
                 chatBox.scrollTop = chatBox.scrollHeight;
+                return messageDiv;
             }
         });
     </script>
@@ -234,19 +349,36 @@ app.jinja_loader = DictLoader({
     'chat_page.html': HTML_CHAT_PAGE,
 })
 
+# The listing of summaries/, rebuilt only when the directory's mtime changes (a file was
+# added, removed or renamed); per-pattern results are kept pre-sorted until then.
+_file_index = {"signature": -1, "files": [], "by_pattern": {}, "rebuilds": 0, "hits": 0}
+_file_index_lock = threading.Lock()
+
+def _describe_file(filename):
+    company_name_match = re.match(r'^([A-Z0-9]+)_', filename)
+    company_name = company_name_match.group(1) if company_name_match else None
+    display_name = filename.replace(".txt", "").replace("_", " ").title()
+    return {"name": filename, "display_name": display_name, "company": company_name}
+
 # --- MODIFIED: get_files now extracts the company name ---
 def get_files(pattern_suffix):
     """Get all summary or table files and extract company name."""
-    pattern = os.path.join("summaries", pattern_suffix)
-    files_found = []
-    for filepath in glob.glob(os.path.join(PROJECT_ROOT, pattern)):
-        filename = os.path.basename(filepath)
-        company_name_match = re.match(r'^([A-Z0-9]+)_', filename)
-        company_name = company_name_match.group(1) if company_name_match else None
-        
-        display_name = filename.replace(".txt", "").replace("_", " ").title()
-        files_found.append({"name": filename, "display_name": display_name, "company": company_name})
-    return sorted(files_found, key=lambda x: x['display_name'], reverse=True)
+    try:
+        signature = os.stat(SUMMARIES_DIR).st_mtime_ns
+    except FileNotFoundError:
+        signature = None
+    with _file_index_lock:
+        if signature != _file_index["signature"]:
+            names = os.listdir(SUMMARIES_DIR) if signature is not None else []
+            files = [_describe_file(name) for name in names if not name.startswith(".")]
+            _file_index.update(signature=signature, by_pattern={}, rebuilds=_file_index["rebuilds"] + 1,
+                               files=sorted(files, key=lambda x: x['display_name'], reverse=True))
+        else:
+            _file_index["hits"] += 1
+        if pattern_suffix not in _file_index["by_pattern"]:
+            _file_index["by_pattern"][pattern_suffix] = [
+                f for f in _file_index["files"] if fnmatch.fnmatch(f["name"], pattern_suffix)]
+        return _file_index["by_pattern"][pattern_suffix]
 
 
 @app.route('/')
@@ -261,14 +393,19 @@ def list_summaries():
 def list_tables():
     return render_template('list_page.html', title="Tables", files=get_files("*_table.txt"), active_page="tables")
 
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_markdown_file(filepath, mtime_ns, size):
+    """Markdown -> HTML for one version of a file; mtime and size are part of the key so edits re-render."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return markdown.markdown(f.read(), extensions=['tables'])
+
 @app.route('/view/<type>/<filename>')
 def view_file(type, filename):
-    filepath = os.path.join(PROJECT_ROOT, "summaries", filename)
+    filepath = os.path.join(SUMMARIES_DIR, filename)
     html_output = ""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            raw_content = f.read()
-            html_output = markdown.markdown(raw_content, extensions=['tables'])
+        stat = os.stat(filepath)
+        html_output = render_markdown_file(filepath, stat.st_mtime_ns, stat.st_size)
     except Exception as e:
         html_output = f"<p>Error reading file: {e}</p>"
     title_prefix = "Summary" if type == "summaries" else "Table"
@@ -279,51 +416,115 @@ def view_file(type, filename):
 def chat(company_name):
     """Renders the chat interface for a specific company."""
     # Check if the context file exists for this company
-    context_filename = f"{company_name}_latest_context.txt"
-    filepath = os.path.join(PROJECT_ROOT, CONTEXT_DIR, context_filename)
-    if not os.path.exists(filepath):
+    if not context_cache.exists(company_name):
         return "Chat context for this company has not been generated. Please run the processing script.", 404
 
     return render_template('chat_page.html', title=f"Chat with {company_name}", company_name=company_name, active_page="summaries")
 
 # --- MODIFIED: API endpoint now uses company_name and reads from contexts/ dir ---
-@app.route('/api/ask', methods=['POST'])
-def api_ask():
-    """Receives a question and a company name, gets an answer from Gemini using the full-text file as context."""
-    data = request.get_json()
+def build_chat_prompt(data):
+    """Returns (prompt, None) for a valid /api/ask request body, or (None, (error response, status))."""
     if not data or 'question' not in data or 'company_name' not in data:
-        return jsonify({'error': 'Invalid request: "question" and "company_name" are required.'}), 400
+        return None, (jsonify({'error': 'Invalid request: "question" and "company_name" are required.'}), 400)
 
     question = data['question']
     company_name = data['company_name']
 
-    # Find the full-text context file
-    context_filename = f"{company_name.upper()}_latest_context.txt"
-    filepath = os.path.join(PROJECT_ROOT, CONTEXT_DIR, context_filename)
-
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            report_text = f.read()
+        report_text, source = select_report_text(company_name.upper(), question,
+                                                 full_context=bool(data.get('full_context')))
     except FileNotFoundError:
-        return jsonify({'error': f'Context file not found for {company_name}.'}), 404
+        return None, (jsonify({'error': f'Context file not found for {company_name}.'}), 404)
     except Exception as e:
-        return jsonify({'error': f'Server error reading file: {e}'}), 500
+        return None, (jsonify({'error': f'Server error reading file: {e}'}), 500)
 
     prompt = (
         "You are a precise financial analyst assistant. Your task is to answer questions based *only* "
-        "on the text from the financial report provided below. Do not use any external knowledge, calculations, or assumptions. "
+        f"on the {source} provided below. Do not use any external knowledge, calculations, or assumptions. "
         "If the answer is not contained within the provided text, you must state: 'The answer to that question is not available in this report.'\n\n"
         "--- BEGIN REPORT TEXT ---\n"
         f"{report_text}\n"
         "--- END REPORT TEXT ---\n\n"
         f"Based only on the report text above, please answer the following question:\nQuestion: {question}"
     )
+    return prompt, None
+
+@app.route('/api/ask', methods=['POST'])
+def api_ask():
+    """Receives a question and a company name, gets an answer from Gemini using the full-text file as context."""
+    prompt, error = build_chat_prompt(request.get_json())
+    if error:
+        return error
     answer = call_google_ai(prompt)
     return jsonify({'answer': answer})
 
+def _sse(payload, event=None):
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(payload)}\n\n"
+
+@app.route('/api/ask/stream', methods=['POST'])
+def api_ask_stream():
+    """
+    Same request as /api/ask, but the answer is sent as Server-Sent Events while the model
+    writes it: 'data: {"text": ...}' for every piece, then 'event: done' (or 'event: error').
+    """
+    prompt, error = build_chat_prompt(request.get_json())
+    if error:
+        return error
+
+    def events():
+        if not llm_gateway.is_available():
+            yield _sse({'error': "The GOOGLE_API_KEY is not configured on the server."}, event='error')
+            return
+        try:
+            for text in llm_gateway.generate_stream(prompt, CHAT_MODEL, task_description="chat response"):
+                yield _sse({'text': text})
+        except Exception as e:
+            print(f"Error during streamed Google AI call: {e}")
+            yield _sse({'error': f"An error occurred while contacting the AI model: {e}"}, event='error')
+            return
+        yield _sse({}, event='done')
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
+
+
+def select_report_text(company, question, full_context=False):
+    """
+    Returns (text, description) for the prompt: the whole report when it is short or
+    full_context is asked for, otherwise only the passages that best match the question
+    (BM25 over the context's chunk index). Falls back to the whole report if the passages
+    found do not cover enough of the question.
+    Both come from context_cache, so hot companies never touch the disk.
+    """
+    entry = context_cache.get(company)
+    report_text = entry["text"]
+    if not full_context and len(report_text) > RETRIEVAL_MIN_CONTEXT_CHARS:
+        try:
+            passages = context_cache.chunk_index(entry).search(question, k=RETRIEVAL_TOP_K)
+        except Exception as e:
+            print(f"Chunk index unavailable for {company}, sending the full report: {e}")
+            passages = []
+        if passages:
+            text = "\n\n".join(f"[Page {p['page']}]\n{p['text']}" if p['page'] is not None else p['text']
+                                 for p in passages)
+            return text, "excerpts from the financial report"
+    return report_text, "text from the financial report"
+
+@app.route('/api/cache-stats')
+def api_cache_stats():
+    """Hit rates and sizes of the in-process caches."""
+    return jsonify({'contexts': context_cache.snapshot_stats(),
+                    'rendered_pages': render_markdown_file.cache_info()._asdict(),
+                    'file_index': {k: _file_index[k] for k in ("rebuilds", "hits")}})
+
+@app.route('/api/llm-metrics')
+def api_llm_metrics():
+    """Per-model call counts, errors, retries, latency and token totals since the server started."""
+    return jsonify({'backend': llm_gateway.BACKEND, 'models': llm_gateway.snapshot_metrics()})
+
 if __name__ == '__main__':
     print("Starting Flask web app...")
-    print(f"Make sure the '{CONTEXT_DIR}/' and 'summaries/' directories exist.")
+    print(f"Make sure the '{CONTEXT_DIR}/' and '{os.path.relpath(SUMMARIES_DIR, PROJECT_ROOT)}/' directories exist.")
     print("Run the `summarize_earnings.py` script first to generate context and summary files.")
     print("Navigate to http://127.0.0.1:5001 to begin.")
     app.run(debug=True, host='0.0.0.0', port=5001)